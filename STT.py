@@ -1,34 +1,88 @@
-import requests
 import os
+import io
+import wave
 import asyncio
-import json
+import logging
+import mimetypes
 from dotenv import load_dotenv
+from sarvam_client import sarvam_client
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 SARVAM_API_KEY = os.getenv("SARVAM_API_KEY")
+STT_MODEL = os.getenv("STT_MODEL", "saarika:v2")
+# The speech-to-text API accepts short clips, so longer audio is sent in windows of this length
+STT_WINDOW_SECONDS = float(os.getenv("STT_WINDOW_SECONDS", "25"))
+# Windows of one upload transcribed at the same time
+STT_CONCURRENCY = int(os.getenv("STT_CONCURRENCY", "4"))
 
-async def transcribe_audio(file_path, language_code):
-    """
-    A simplified version of the transcribe_audio function that doesn't use Azure dependencies.
-    This is a mock implementation that simulates the transcription process.
-    In a real implementation, you would use the appropriate API calls to Sarvam AI.
+def split_wav(audio, window_seconds=STT_WINDOW_SECONDS):
+    """Cut a WAV file object into WAV clips of at most window_seconds each.
+
+    Returns None, with the file rewound, if it isn't a WAV file.
     """
     try:
-        # For demonstration purposes, we'll just return a mock response
-        # In a real implementation, you would make the actual API calls to Sarvam AI
-        
-        # Simulate processing time
-        await asyncio.sleep(2)
-        
-        # Return a mock transcription
-        return f"This is a mock transcription for the file {os.path.basename(file_path)} in language {language_code}. In a real implementation, this would be the actual transcription from Sarvam AI's Speech-to-Text API."
-    
-    except Exception as e:
-        return f"Error during transcription: {str(e)}"
+        with wave.open(audio, "rb") as source:
+            params = source.getparams()
+            frames_per_window = max(1, int(window_seconds * params.framerate))
+            windows = []
+            while True:
+                frames = source.readframes(frames_per_window)
+                if not frames:
+                    break
+                buffer = io.BytesIO()
+                with wave.open(buffer, "wb") as clip:
+                    clip.setparams(params)
+                    clip.writeframes(frames)
+                windows.append(buffer.getvalue())
+            return windows
+    except (wave.Error, EOFError):
+        audio.seek(0)
+        return None
+
+def read_whole(audio, filename, content_type=None):
+    """The file as one clip, with its upload content type or one guessed from the filename."""
+    if not content_type or content_type == "application/octet-stream":
+        content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    return [audio.read()], content_type
+
+async def transcribe_window(data, language_code, filename, content_type, semaphore):
+    async with semaphore:
+        response = await sarvam_client.post(
+            "/speech-to-text",
+            files={"file": (filename, data, content_type)},
+            data={"language_code": language_code, "model": STT_MODEL},
+            headers={"api-subscription-key": SARVAM_API_KEY or ""},
+        )
+    if response.status_code != 200:
+        raise RuntimeError(f"Sarvam STT returned {response.status_code}: {response.text}")
+    return response.json().get("transcript", "")
+
+async def transcribe_audio(audio, language_code, filename="audio.wav", content_type=None):
+    """Transcribe a seekable audio file object with Sarvam AI's Speech-to-Text API.
+
+    Only WAV audio is windowed: long WAV files are split into windows that are
+    transcribed concurrently, and the transcripts are joined in order. Other
+    formats (MP3, WebM, ...) are sent whole with their own content type.
+    """
+    # Reading and splitting may touch a spilled temp file, so keep it off the event loop
+    windows = await asyncio.to_thread(split_wav, audio)
+    if windows is None:
+        windows, content_type = await asyncio.to_thread(read_whole, audio, filename, content_type)
+    else:
+        content_type = "audio/wav"
+    logger.info(f"Transcribing {len(windows)} audio window(s) of {content_type}")
+    semaphore = asyncio.Semaphore(STT_CONCURRENCY)
+    transcripts = await asyncio.gather(*(
+        transcribe_window(window, language_code, filename, content_type, semaphore) for window in windows
+    ))
+    return " ".join(transcript.strip() for transcript in transcripts if transcript.strip())
 
 # Example usage
 # if __name__ == "__main__":
 #     import sys
 #     file_path = sys.argv[1] if len(sys.argv) > 1 else "sample.wav"
-#     result = asyncio.run(transcribe_audio(file_path, "en-IN"))
+#     with open(file_path, "rb") as audio:
+#         result = asyncio.run(transcribe_audio(audio, "en-IN", os.path.basename(file_path)))
 #     print("Transcription:", result)
\ No newline at end of file
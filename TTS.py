@@ -1,46 +1,111 @@
-import requests
+import asyncio
 import base64
 import wave
+import io
 import os
+import re
 from dotenv import load_dotenv
+from sarvam_client import sarvam_client
 load_dotenv()
 SARVAM_API_KEY = os.getenv("SARVAM_API_KEY")
-def text_to_speech_sarvam(text, target_language_code, api_key=SARVAM_API_KEY, speaker="neel", model="bulbul:v1", pitch=0, pace=1.0, loudness=1.0, chunk_size=500):
-    url = "https://api.sarvam.ai/text-to-speech"
+# Chunks of one request synthesized at the same time
+TTS_CONCURRENCY = int(os.getenv("TTS_CONCURRENCY", "4"))
+
+# Raw PCM format used when the API returns bare frames instead of a WAV file
+SAMPLE_RATE = 22050
+SAMPLE_WIDTH = 2
+CHANNELS = 1
+
+# Sentence ends are punctuation followed by whitespace, so "8.5%" stays whole
+SENTENCE_END_RE = re.compile(r"(?<=[.!?।])\s+|\n+")
+
+def split_text(text, chunk_size=500):
+    """Pack whole sentences into chunks of at most chunk_size characters.
+
+    Sentences longer than a chunk are split between words, and only a single
+    word longer than a chunk is ever cut.
+    """
+    chunks, current = [], ""
+    for sentence in (s.strip() for s in SENTENCE_END_RE.split(text)):
+        if not sentence:
+            continue
+        pieces = [sentence]
+        if len(sentence) > chunk_size:
+            pieces, piece = [], ""
+            for word in sentence.split():
+                while len(word) > chunk_size:
+                    if piece:
+                        pieces.append(piece)
+                        piece = ""
+                    pieces.append(word[:chunk_size])
+                    word = word[chunk_size:]
+                if piece and len(piece) + 1 + len(word) > chunk_size:
+                    pieces.append(piece)
+                    piece = ""
+                piece = f"{piece} {word}" if piece else word
+            if piece:
+                pieces.append(piece)
+        for piece in pieces:
+            if current and len(current) + 1 + len(piece) > chunk_size:
+                chunks.append(current)
+                current = ""
+            current = f"{current} {piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+def decode_audio(audio):
+    """(params, frames) of a base64 audio payload, which is a WAV file or bare PCM."""
+    data = base64.b64decode(audio)
+    if data[:4] == b"RIFF":
+        with wave.open(io.BytesIO(data), "rb") as wav_file:
+            return (wav_file.getnchannels(), wav_file.getsampwidth(), wav_file.getframerate()), wav_file.readframes(wav_file.getnframes())
+    return (CHANNELS, SAMPLE_WIDTH, SAMPLE_RATE), data
+
+async def synthesize_chunk(chunk, payload, headers, semaphore):
+    async with semaphore:
+        response = await sarvam_client.post("/text-to-speech", json={**payload, "inputs": [chunk]}, headers=headers)
+    if response.status_code != 200:
+        raise RuntimeError(f"Sarvam TTS returned {response.status_code}: {response.text}")
+    audio = response.json().get("audios", [None])[0]
+    if not audio:
+        raise RuntimeError("Sarvam TTS returned no audio data")
+    return decode_audio(audio)
+
+async def text_to_speech_sarvam(text, target_language_code, api_key=SARVAM_API_KEY, speaker="neel", model="bulbul:v1", pitch=0, pace=1.0, loudness=1.0, chunk_size=500):
+    """Synthesize text and return it as one WAV file (bytes).
+
+    The chunks are synthesized concurrently and their frames joined in order.
+    """
     headers = {
         "Content-Type": "application/json",
         "api-subscription-key": api_key
     }
-    
-    chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+    payload = {
+        "target_language_code": target_language_code,
+        "speaker": speaker,
+        "model": model,
+        "pitch": pitch,
+        "pace": pace,
+        "loudness": loudness,
+        "enable_preprocessing": True,
+    }
+
+    chunks = split_text(text, chunk_size)
     print(f"Total chunks: {len(chunks)}")
-    
-    for i, chunk in enumerate(chunks):
-        payload = {
-            "inputs": [chunk],
-            "target_language_code": target_language_code,
-            "speaker": speaker,
-            "model": model,
-            "pitch": pitch,
-            "pace": pace,
-            "loudness": loudness,
-            "enable_preprocessing": True,
-        }
-        
-        response = requests.post(url, json=payload, headers=headers)
-        
-        if response.status_code == 200:
-            audio = response.json().get("audios", [None])[0]
-            if audio:
-                audio = base64.b64decode(audio)
-                with wave.open(f"output{i}.wav", "wb") as wav_file:
-                    wav_file.setnchannels(1)
-                    wav_file.setsampwidth(2)
-                    wav_file.setframerate(22050)
-                    wav_file.writeframes(audio)
-                print(f"Audio file {i} saved successfully as 'output{i}.wav'!")
-            else:
-                print(f"No audio data received for chunk {i}.")
-        else:
-            print(f"Error for chunk {i}: {response.status_code}")
-            print(response.json())
+    if not chunks:
+        raise ValueError("No text to synthesize")
+
+    semaphore = asyncio.Semaphore(TTS_CONCURRENCY)
+    results = await asyncio.gather(*(synthesize_chunk(chunk, payload, headers, semaphore) for chunk in chunks))
+    channels, sample_width, frame_rate = results[0][0]
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(sample_width)
+        wav_file.setframerate(frame_rate)
+        for params, frames in results:
+            if params != results[0][0]:
+                raise RuntimeError(f"Sarvam TTS returned mixed audio formats: {params} and {results[0][0]}")
+            wav_file.writeframes(frames)
+    return buffer.getvalue()
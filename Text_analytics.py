@@ -1,18 +1,17 @@
-import requests
 import os
 from dotenv import load_dotenv
+from sarvam_client import sarvam_client
 load_dotenv()
 SARVAM_API_KEY = os.getenv("SARVAM_API_KEY")
 
-url = "https://api.sarvam.ai/text-analytics"
-def analyze(context,question):
-    payload = f"text={context}&questions={question}"
+async def analyze(context,question):
+    # Form-encoded by httpx, so "&" or "=" in the context can't break the payload
+    payload = {"text": context, "questions": question}
     headers = {
         "api-subscription-key": SARVAM_API_KEY,
         "Content-Type": "application/x-www-form-urlencoded"
     }
 
-    response = requests.request("POST", url, data=payload, headers=headers)
+    response = await sarvam_client.post("/text-analytics", data=payload, headers=headers)
 
     return response
-
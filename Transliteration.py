@@ -1,10 +1,9 @@
-import requests
 import os
 from dotenv import load_dotenv
-url = "https://api.sarvam.ai/transliterate"
+from sarvam_client import sarvam_client
 load_dotenv()
 SARVAM_API_KEY = os.getenv("SARVAM_API_KEY")
-def transliterate(input_text, source_language_code, target_language_code):
+async def transliterate_response(input_text, source_language_code, target_language_code):
     payload = {
         "spoken_form": False,
         "input": input_text,
@@ -17,5 +16,8 @@ def transliterate(input_text, source_language_code, target_language_code):
         "Content-Type": "application/json"
     }
 
-    response = requests.request("POST", url, json=payload, headers=headers)
+    return await sarvam_client.post("/transliterate", json=payload, headers=headers)
+
+async def transliterate(input_text, source_language_code, target_language_code):
+    response = await transliterate_response(input_text, source_language_code, target_language_code)
     return response.json()
\ No newline at end of file
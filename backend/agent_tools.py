@@ -0,0 +1,42 @@
+import os
+import asyncio
+import logging
+from langchain_core.tools import BaseTool, StructuredTool
+from telemetry import registry
+
+logger = logging.getLogger(__name__)
+
+# Longest a single tool call may take before the agent gets a timeout message instead of a result;
+# TOOL_TIMEOUT_<TOOL NAME> (e.g. TOOL_TIMEOUT_RETRIEVER_TOOL) overrides it per tool
+TOOL_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", "20"))
+
+tool_timeouts = registry.counter("tool_timeouts_total", "Tool calls abandoned after their timeout", ("tool",))
+
+def tool_timeout(name: str) -> float:
+    return float(os.getenv(f"TOOL_TIMEOUT_{name.upper()}", TOOL_TIMEOUT_SECONDS))
+
+def with_timeout(tool: BaseTool, seconds: float = None) -> BaseTool:
+    """The same tool (name, description, arguments), but a call running past ``seconds`` is cancelled.
+
+    The agent then gets a message saying so instead of waiting, so one slow tool
+    doesn't hold up an answer the other tools' results can already give. The
+    agent's ToolNode runs the tool calls of one step concurrently, so each call
+    has its own timeout.
+    """
+    seconds = tool_timeout(tool.name) if seconds is None else seconds
+
+    async def run(**kwargs):
+        try:
+            return await asyncio.wait_for(tool.coroutine(**kwargs), timeout=seconds)
+        except asyncio.TimeoutError:
+            tool_timeouts.inc(tool=tool.name)
+            logger.warning(f"{tool.name} timed out after {seconds:g}s")
+            return (f"{tool.name} did not respond within {seconds:g} seconds. Answer from the other results "
+                    f"if they are enough; otherwise tell the user this information is temporarily unavailable.")
+
+    return StructuredTool.from_function(
+        coroutine=run,
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+    )
@@ -0,0 +1,122 @@
+import os
+import re
+import time
+import threading
+import logging
+from collections import OrderedDict
+from typing import Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+
+# Words that point back at earlier turns; answers to such questions depend on the conversation
+FOLLOW_UP_RE = re.compile(
+    r"\b(it|its|that|this|those|these|they|them|their|he|she|his|her|above|previous|earlier|same|"
+    r"also|else|more|another|other|again|instead|what about|how about|and for)\b",
+    re.IGNORECASE,
+)
+
+def normalize_question(question: str) -> str:
+    return " ".join(question.lower().split())
+
+def is_context_free(question: str) -> bool:
+    """True if the question can be answered without the conversation so far."""
+    return not FOLLOW_UP_RE.search(question)
+
+class SemanticAnswerCache:
+    """Answers to context-free questions, looked up by cosine similarity of the question embedding.
+
+    Entries expire after ``ttl_seconds`` and the least recently used ones are
+    evicted beyond ``max_entries``. The cache empties itself when the file named
+    by ``index_marker`` (written by every ingestion run) changes, so answers
+    never outlive the index they were generated from.
+    """
+
+    def __init__(self, embeddings, index_marker: str, threshold: float = ANSWER_CACHE_THRESHOLD,
+                 max_entries: int = ANSWER_CACHE_MAX_ENTRIES, ttl_seconds: int = ANSWER_CACHE_TTL_SECONDS):
+        self.embeddings = embeddings
+        self.index_marker = index_marker
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()  # normalized question -> (unit vector, answer, created_at)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._matrix = None
+        self._keys = []
+        self._fingerprint = self._index_fingerprint()
+        self._lock = threading.Lock()
+
+    def _index_fingerprint(self):
+        try:
+            stat = os.stat(self.index_marker)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def _check_index(self):
+        fingerprint = self._index_fingerprint()
+        if fingerprint != self._fingerprint:
+            if self.entries:
+                logger.info(f"Index changed; dropping {len(self.entries)} cached answers")
+                self.invalidations += 1
+            self.entries.clear()
+            self._matrix = None
+            self._fingerprint = fingerprint
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl_seconds
+        expired = [key for key, (_, _, created) in self.entries.items() if created < cutoff]
+        for key in expired:
+            del self.entries[key]
+        if expired:
+            self._matrix = None
+
+    async def embed(self, question: str) -> np.ndarray:
+        vector = np.asarray(await self.embeddings.aembed_query(normalize_question(question)), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def lookup(self, vector: np.ndarray) -> Optional[str]:
+        """Return the cached answer of the most similar question above the threshold."""
+        with self._lock:
+            self._check_index()
+            self._expire()
+            if self.entries:
+                if self._matrix is None:
+                    self._keys = list(self.entries)
+                    self._matrix = np.stack([self.entries[key][0] for key in self._keys])
+                scores = self._matrix @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    key = self._keys[best]
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    logger.info(f"Answer cache hit (similarity {scores[best]:.3f}): {key!r}")
+                    return self.entries[key][1]
+            self.misses += 1
+            return None
+
+    def store(self, question: str, vector: np.ndarray, answer: str):
+        with self._lock:
+            self._check_index()
+            self.entries[normalize_question(question)] = (vector, answer, time.time())
+            self.entries.move_to_end(normalize_question(question))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self._matrix = None
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self.entries),
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,64 @@
+import re
+from pathlib import Path
+from typing import Optional
+
+# Canonical bank codes and how users (and the corpus directories) refer to them
+BANK_ALIASES = {
+    "HDFC": ["hdfc"],
+    "SBI": ["sbi", "state bank"],
+    "IOB": ["iob", "indian overseas"],
+}
+
+# Loan categories are the directory names under each bank; the aliases are what questions say
+LOAN_TYPE_ALIASES = {
+    "home_loans": ["home loan", "housing loan", "home finance", "mortgage", "house"],
+    "education_loans": ["education", "student", "study", "studies", "credila"],
+    "gold_loans": ["gold"],
+    "vehicle_loans": ["vehicle", "car loan", "car", "two wheeler", "two-wheeler", "bike", "commercial vehicle"],
+    "personal_loans": ["personal loan", "overdraft", "smartdraft"],
+    "business_loans": ["business", "msme", "working capital"],
+    "construction_loans": ["construction equipment", "construction"],
+    "government_loans": ["government", "concessional", "subsidy", "subsidised", "subsidized"],
+    "property_loans": ["loan against property", "against property"],
+    "rural_loans": ["rural"],
+    "agricultural_loans": ["agriculture", "agricultural", "kisan", "kcc", "farm", "farmer", "farming", "crop"],
+    "microfinance_loans": ["microfinance", "self help group", "shg"],
+    "credit_card_loans": ["credit card"],
+}
+
+def _pattern(aliases: list[str]) -> re.Pattern:
+    # Whole words with an optional plural "s", so "car" matches "cars" but not "card"
+    return re.compile(r"\b(?:" + "|".join(re.escape(alias) for alias in aliases) + r")s?\b", re.IGNORECASE)
+
+BANK_PATTERNS = {bank: _pattern(aliases) for bank, aliases in BANK_ALIASES.items()}
+LOAN_TYPE_PATTERNS = {loan_type: _pattern(aliases) for loan_type, aliases in LOAN_TYPE_ALIASES.items()}
+
+def bank_from_name(name: str) -> Optional[str]:
+    for bank, pattern in BANK_PATTERNS.items():
+        if pattern.search(name):
+            return bank
+    return None
+
+def path_metadata(path: str) -> dict:
+    """``bank`` and ``loan_type`` for a file laid out as <base>/<Bank>/<loan_category>/<file>."""
+    parts = Path(path).parts
+    if len(parts) < 3:
+        return {}
+    metadata = {"loan_type": parts[-2]}
+    bank = bank_from_name(parts[-3])
+    if bank:
+        metadata["bank"] = bank
+    return metadata
+
+def detect_filter(question: str) -> Optional[dict]:
+    """Chroma ``where`` filter for the banks and loan types a question mentions, if any."""
+    banks = [bank for bank, pattern in BANK_PATTERNS.items() if pattern.search(question)]
+    loan_types = [loan_type for loan_type, pattern in LOAN_TYPE_PATTERNS.items() if pattern.search(question)]
+    clauses = []
+    if banks:
+        clauses.append({"bank": banks[0]} if len(banks) == 1 else {"bank": {"$in": banks}})
+    if loan_types:
+        clauses.append({"loan_type": loan_types[0]} if len(loan_types) == 1 else {"loan_type": {"$in": loan_types}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
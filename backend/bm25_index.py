@@ -0,0 +1,127 @@
+import os
+import re
+import json
+import math
+import logging
+from collections import Counter, defaultdict
+from typing import Optional
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+BM25_INDEX_FILE = "bm25_index.json"
+BM25_INDEX_VERSION = 1
+
+# Keeps exact tokens such as "cblr", "8.64%" and "2025" intact
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?%?")
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_RE.findall(text.lower())
+
+def matches(metadata: dict, where: Optional[dict]) -> bool:
+    """Evaluate the subset of Chroma ``where`` filters that retrieval builds ($and/$or/$in/$eq)."""
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            if "$in" in condition and metadata.get(key) not in condition["$in"]:
+                return False
+            if "$eq" in condition and metadata.get(key) != condition["$eq"]:
+                return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+class BM25Index:
+    """In-process Okapi BM25 index over the same chunks as the Chroma collection.
+
+    Built by ingestion and saved next to the vector store, then loaded once at
+    startup. Search walks only the postings of the query terms.
+    """
+
+    def __init__(self, texts: list[str], metadatas: list[dict], k1: float = 1.5, b: float = 0.75):
+        self.texts = texts
+        self.metadatas = metadatas
+        self.k1 = k1
+        self.b = b
+        self.doc_lens = []
+        self.postings = defaultdict(list)
+        for doc_index, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            self.doc_lens.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings[term].append((doc_index, tf))
+        self.avgdl = sum(self.doc_lens) / len(self.doc_lens) if self.doc_lens else 0.0
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def _idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.texts) - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, k: int = 3, where: Optional[dict] = None) -> list[tuple[Document, float]]:
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf(term)
+            for doc_index, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lens[doc_index] / self.avgdl)
+                scores[doc_index] += idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        results = []
+        for doc_index, score in ranked:
+            if matches(self.metadatas[doc_index], where):
+                results.append((Document(page_content=self.texts[doc_index], metadata=dict(self.metadatas[doc_index])), score))
+                if len(results) == k:
+                    break
+        return results
+
+    def save(self, path: str):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": BM25_INDEX_VERSION,
+                "k1": self.k1,
+                "b": self.b,
+                "texts": self.texts,
+                "metadatas": self.metadatas,
+            }, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["BM25Index"]:
+        if not os.path.exists(path):
+            logger.warning(f"No BM25 index at {path}; run process_bank_docs.py to build it")
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != BM25_INDEX_VERSION:
+            logger.warning(f"BM25 index at {path} has an old format; run process_bank_docs.py to rebuild it")
+            return None
+        return cls(data["texts"], data["metadatas"], k1=data["k1"], b=data["b"])
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore) -> "BM25Index":
+        """Index exactly the chunks currently stored in a Chroma collection."""
+        stored = vectorstore.get(include=["documents", "metadatas"])
+        return cls(stored["documents"], [metadata or {} for metadata in stored["metadatas"]])
+
+def reciprocal_rank_fusion(rankings: list[tuple[list[Document], float]], k: int, rrf_k: int = 60) -> list[Document]:
+    """Fuse weighted ranked lists: each document scores sum(weight / (rrf_k + rank))."""
+    scores, docs = defaultdict(float), {}
+    for ranking, weight in rankings:
+        for rank, doc in enumerate(ranking, 1):
+            key = (doc.metadata.get("source"), doc.page_content)
+            docs.setdefault(key, doc)
+            scores[key] += weight / (rrf_k + rank)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [docs[key] for key in best]
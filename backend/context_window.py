@@ -0,0 +1,132 @@
+import os
+import asyncio
+import logging
+from functools import lru_cache
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+from token_usage import UsageCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+# Most recent turns replayed verbatim, and the token budget they must fit in
+HISTORY_MAX_TURNS = int(os.getenv("HISTORY_MAX_TURNS", "6"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+HISTORY_SUMMARY_MAX_WORDS = int(os.getenv("HISTORY_SUMMARY_MAX_WORDS", "150"))
+
+# Per-message overhead the chat format adds on top of the content tokens
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PROMPT = '''You maintain a running summary of a conversation between a user and a loan advisor.
+Update the summary with the new turns below. Keep the user's stated needs, the banks and loan
+products discussed, and any figures quoted. Use at most {max_words} words.
+
+Current summary:
+{summary}
+
+New turns:
+{turns}
+
+Updated summary:'''
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")  # gpt-4o family
+    except Exception as e:
+        logger.warning(f"tiktoken unavailable, estimating tokens from characters: {e}")
+        return None
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+def turn_tokens(turn: dict) -> int:
+    return count_tokens(turn["Human"]) + count_tokens(turn["AI"]) + 2 * MESSAGE_OVERHEAD_TOKENS
+
+def window_start(turns: list[dict], max_turns: int = HISTORY_MAX_TURNS, token_budget: int = HISTORY_TOKEN_BUDGET) -> int:
+    """Index of the oldest turn that is still replayed verbatim.
+
+    Walks back from the newest turn until either the turn count or the token
+    budget is exhausted; everything before the returned index belongs in the summary.
+    """
+    used = 0
+    start = len(turns)
+    while start > 0 and len(turns) - start < max_turns:
+        cost = turn_tokens(turns[start - 1])
+        if used + cost > token_budget:
+            break
+        used += cost
+        start -= 1
+    return start
+
+def assemble_context(turns: list[dict], summary: str, covered_turns: int) -> tuple[list, dict]:
+    """Build the history messages for the agent and report the prompt tokens saved.
+
+    ``summary`` folds the first ``covered_turns`` turns. Turns that have left the
+    verbatim window but are not folded yet (the summary is refreshed in the
+    background after each answer) are dropped rather than blowing the budget.
+    """
+    start = window_start(turns)
+    messages = []
+    if summary and covered_turns:
+        messages.append(SystemMessage(content=f"Summary of the earlier conversation:\n{summary}"))
+    if covered_turns < start:
+        logger.warning(f"History summary is {start - covered_turns} turns behind; dropping them")
+    for entry in turns[start:]:
+        messages.append(HumanMessage(content=entry["Human"]))
+        messages.append(AIMessage(content=entry["AI"]))
+
+    full_tokens = sum(turn_tokens(turn) for turn in turns)
+    used_tokens = sum(turn_tokens(turn) for turn in turns[start:])
+    if summary and covered_turns:
+        used_tokens += count_tokens(summary) + MESSAGE_OVERHEAD_TOKENS
+    stats = {
+        "turns": len(turns),
+        "verbatim_turns": len(turns) - start,
+        "summarized_turns": min(covered_turns, start),
+        "history_tokens": used_tokens,
+        "full_history_tokens": full_tokens,
+        "tokens_saved": max(full_tokens - used_tokens, 0),
+    }
+    return messages, stats
+
+class HistorySummarizer:
+    """Folds turns that leave the verbatim window into a per-session rolling summary.
+
+    The summary is cached in the conversation store together with the number of
+    turns it covers, so each turn is summarized once instead of on every request.
+    """
+
+    def __init__(self, store, llm):
+        self.store = store
+        self.llm = llm
+        self._in_flight = set()
+
+    async def refresh(self, session_id: str):
+        if session_id in self._in_flight:
+            return
+        self._in_flight.add(session_id)
+        try:
+            turns = await asyncio.to_thread(self.store.history, session_id)
+            summary, covered = await asyncio.to_thread(self.store.get_summary, session_id)
+            start = window_start(turns)
+            if covered >= start:
+                return
+            new_turns = "\n".join(f"User: {t['Human']}\nAdvisor: {t['AI']}" for t in turns[covered:start])
+            prompt = SUMMARY_PROMPT.format(
+                max_words=HISTORY_SUMMARY_MAX_WORDS,
+                summary=summary or "(empty)",
+                turns=new_turns,
+            )
+            # Summaries are spent on the session's behalf, so they count towards its token usage
+            usage = UsageCallbackHandler()
+            result = await self.llm.ainvoke(prompt, config={"callbacks": [usage]})
+            await asyncio.to_thread(self.store.save_summary, session_id, result.content, start)
+            await asyncio.to_thread(self.store.add_usage, session_id, usage.usage)
+            logger.info(f"Folded {start - covered} turns into the summary of session {session_id}")
+        except Exception as e:
+            logger.error(f"Error refreshing history summary for session {session_id}: {str(e)}")
+        finally:
+            self._in_flight.discard(session_id)
@@ -0,0 +1,178 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+CONV_DB_PATH = os.getenv("CONV_DB_PATH", "conversations.db")
+CONV_SESSION_TTL_SECONDS = int(os.getenv("CONV_SESSION_TTL_SECONDS", str(7 * 24 * 3600)))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    last_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    human TEXT NOT NULL,
+    ai TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS turns_session_idx ON turns (session_id, id);
+CREATE TABLE IF NOT EXISTS summaries (
+    session_id TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    covered_turns INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS token_usage (
+    session_id TEXT PRIMARY KEY,
+    input_tokens INTEGER NOT NULL,
+    output_tokens INTEGER NOT NULL,
+    cached_tokens INTEGER NOT NULL,
+    llm_calls INTEGER NOT NULL,
+    cost_usd REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+def new_session_id() -> str:
+    return uuid.uuid4().hex
+
+class ConversationStore:
+    """Session-keyed conversation history in SQLite.
+
+    Each turn is a single INSERT, so appends cost the same no matter how long
+    a conversation gets. WAL mode lets several uvicorn workers read while one
+    writes, and sessions idle for longer than the TTL are expired.
+    """
+
+    def __init__(self, path: str = CONV_DB_PATH, ttl_seconds: int = CONV_SESSION_TTL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads, so keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _expired(self, conn: sqlite3.Connection, session_id: str) -> bool:
+        row = conn.execute("SELECT last_seen FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return row is not None and row[0] < time.time() - self.ttl_seconds
+
+    def _clear_if_expired(self, conn: sqlite3.Connection, session_id: str):
+        # Runs inside the caller's write transaction, so a session that comes back after its
+        # TTL starts empty instead of reviving its old turns, summary and usage
+        if self._expired(conn, session_id):
+            for table in ("turns", "summaries", "token_usage", "sessions"):
+                conn.execute(f"DELETE FROM {table} WHERE session_id = ?", (session_id,))
+
+    def append(self, session_id: str, human: str, ai: str):
+        """Store one Human/AI turn and refresh the session's expiry."""
+        now = time.time()
+        with self._connect() as conn:
+            self._clear_if_expired(conn, session_id)
+            conn.execute(
+                "INSERT INTO turns (session_id, human, ai, created_at) VALUES (?, ?, ?, ?)",
+                (session_id, human, ai, now),
+            )
+            conn.execute(
+                "INSERT INTO sessions (session_id, last_seen) VALUES (?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET last_seen = excluded.last_seen",
+                (session_id, now),
+            )
+
+    def history(self, session_id: str) -> list[dict]:
+        """Return the session's turns oldest first, or nothing if the session expired."""
+        conn = self._connect()
+        row = conn.execute("SELECT last_seen FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None or row[0] < time.time() - self.ttl_seconds:
+            return []
+        rows = conn.execute(
+            "SELECT human, ai FROM turns WHERE session_id = ? ORDER BY id",
+            (session_id,),
+        ).fetchall()
+        return [{"Human": human, "AI": ai} for human, ai in rows]
+
+    def get_summary(self, session_id: str) -> tuple[str, int]:
+        """Return the rolling summary and how many of the oldest turns it covers."""
+        conn = self._connect()
+        if self._expired(conn, session_id):
+            return "", 0
+        row = conn.execute(
+            "SELECT summary, covered_turns FROM summaries WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return (row[0], row[1]) if row else ("", 0)
+
+    def save_summary(self, session_id: str, summary: str, covered_turns: int):
+        """Store a summary unless another worker already saved one covering more turns."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO summaries (session_id, summary, covered_turns, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET summary = excluded.summary, "
+                "covered_turns = excluded.covered_turns, updated_at = excluded.updated_at "
+                "WHERE excluded.covered_turns > summaries.covered_turns",
+                (session_id, summary, covered_turns, time.time()),
+            )
+
+    def add_usage(self, session_id: str, usage: dict):
+        """Add one request's token usage to the session's running totals."""
+        with self._connect() as conn:
+            self._clear_if_expired(conn, session_id)
+            conn.execute(
+                "INSERT INTO token_usage (session_id, input_tokens, output_tokens, cached_tokens, llm_calls, cost_usd, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(session_id) DO UPDATE SET "
+                "input_tokens = input_tokens + excluded.input_tokens, "
+                "output_tokens = output_tokens + excluded.output_tokens, "
+                "cached_tokens = cached_tokens + excluded.cached_tokens, "
+                "llm_calls = llm_calls + excluded.llm_calls, "
+                "cost_usd = cost_usd + excluded.cost_usd, updated_at = excluded.updated_at",
+                (session_id, usage["input_tokens"], usage["output_tokens"], usage["cached_tokens"],
+                 usage["llm_calls"], usage["cost_usd"], time.time()),
+            )
+
+    def get_usage(self, session_id: str) -> dict:
+        """Token totals for the session so far (zeros for a new or expired session)."""
+        conn = self._connect()
+        keys = ("input_tokens", "output_tokens", "cached_tokens", "llm_calls", "cost_usd")
+        if self._expired(conn, session_id):
+            return dict.fromkeys(keys, 0)
+        row = conn.execute(
+            "SELECT input_tokens, output_tokens, cached_tokens, llm_calls, cost_usd FROM token_usage WHERE session_id = ?",
+            (session_id,),
+        ).fetchone()
+        return dict(zip(keys, row)) if row else dict.fromkeys(keys, 0)
+
+    def purge_expired(self) -> int:
+        """Delete sessions idle for longer than the TTL; returns how many were removed."""
+        cutoff = time.time() - self.ttl_seconds
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM turns WHERE session_id IN (SELECT session_id FROM sessions WHERE last_seen < ?)",
+                (cutoff,),
+            )
+            conn.execute(
+                "DELETE FROM summaries WHERE session_id IN (SELECT session_id FROM sessions WHERE last_seen < ?)",
+                (cutoff,),
+            )
+            conn.execute(
+                "DELETE FROM token_usage WHERE session_id IN (SELECT session_id FROM sessions WHERE last_seen < ?)",
+                (cutoff,),
+            )
+            removed = conn.execute("DELETE FROM sessions WHERE last_seen < ?", (cutoff,)).rowcount
+        if removed:
+            logger.info(f"Expired {removed} conversation sessions")
+        return removed
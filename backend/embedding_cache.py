@@ -0,0 +1,149 @@
+import os
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+import logging
+from array import array
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.db")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+
+# SQLite limits the number of bound parameters per statement
+LOOKUP_BATCH = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    key TEXT PRIMARY KEY,
+    vector BLOB NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS embeddings_last_used_idx ON embeddings (last_used);
+"""
+
+class CachedEmbeddings(Embeddings):
+    """On-disk, content-addressed cache in front of another embeddings model.
+
+    Vectors are keyed by (model, dimensions, sha256 of the text), so any text
+    that was embedded once, by ingestion or by a query, never goes back to the
+    API. The cache holds at most ``max_entries`` vectors and evicts the least
+    recently used ones.
+    """
+
+    def __init__(self, underlying: Embeddings, model: str, dimensions: int,
+                 path: str = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.underlying = underlying
+        self.model = model
+        self.dimensions = dimensions
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._counter_lock = threading.Lock()
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{self.dimensions}\0{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys: list[str]) -> dict[str, list[float]]:
+        found = {}
+        conn = self._connect()
+        unique = list(dict.fromkeys(keys))
+        for i in range(0, len(unique), LOOKUP_BATCH):
+            batch = unique[i:i + LOOKUP_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            for key, blob in conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch):
+                vector = array("f")
+                vector.frombytes(blob)
+                found[key] = vector.tolist()
+        if found:
+            now = time.time()
+            with conn:
+                conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key in found])
+        return found
+
+    def _store(self, items: dict[str, list[float]]):
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, array("f", vector).tobytes(), now) for key, vector in items.items()],
+            )
+            excess = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+                logger.info(f"Evicted {excess} least recently used embeddings from the cache")
+
+    def _count(self, hits: int, misses: int):
+        with self._counter_lock:
+            self.hits += hits
+            self.misses += misses
+
+    def _split(self, texts: list[str]) -> tuple[list[str], dict, list[str]]:
+        keys = [self._key(text) for text in texts]
+        cached = self._lookup(keys)
+        missing = list(dict.fromkeys(text for text, key in zip(texts, keys) if key not in cached))
+        return keys, cached, missing
+
+    def _merge(self, texts, keys, cached, missing, vectors) -> list[list[float]]:
+        # Round to float32 like stored vectors, so hits and misses return identical values
+        fresh = {self._key(text): array("f", vector).tolist() for text, vector in zip(missing, vectors)}
+        if fresh:
+            self._store(fresh)
+        self._count(len(texts) - len(missing), len(missing))
+        cached.update(fresh)
+        return [cached[key] for key in keys]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys, cached, missing = self._split(texts)
+        vectors = self.underlying.embed_documents(missing) if missing else []
+        return self._merge(texts, keys, cached, missing, vectors)
+
+    def embed_query(self, text: str) -> list[float]:
+        keys, cached, missing = self._split([text])
+        vectors = [self.underlying.embed_query(text)] if missing else []
+        return self._merge([text], keys, cached, missing, vectors)[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys, cached, missing = await asyncio.to_thread(self._split, texts)
+        vectors = await self.underlying.aembed_documents(missing) if missing else []
+        return await asyncio.to_thread(self._merge, texts, keys, cached, missing, vectors)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        keys, cached, missing = await asyncio.to_thread(self._split, [text])
+        vectors = [await self.underlying.aembed_query(text)] if missing else []
+        return (await asyncio.to_thread(self._merge, [text], keys, cached, missing, vectors))[0]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": self._connect().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0],
+            "max_entries": self.max_entries,
+        }
+
+def cached_openai_embeddings(model: str = "text-embedding-3-small", dimensions: int = 1536) -> CachedEmbeddings:
+    """OpenAI embeddings behind the shared on-disk cache."""
+    return CachedEmbeddings(OpenAIEmbeddings(model=model, dimensions=dimensions), model=model, dimensions=dimensions)
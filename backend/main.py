@@ -1,15 +1,31 @@
 import os
+import json
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
 from langchain_openai import ChatOpenAI
-from langchain_community.tools.tavily_search import TavilySearchResults
 from langgraph.prebuilt import create_react_agent
-from langchain_core.messages import AnyMessage, SystemMessage, HumanMessage, ToolMessage, AIMessage
-from rag import retriever_tool
-from prompts import react_prompt
-from fastapi import FastAPI, Request
+from langchain_core.messages import AnyMessage, SystemMessage, HumanMessage, ToolMessage
+from rag import (RAG_TOOL_MODE, answer_question, end_speculation, retriever_tool, retrieval_engine, speculate,
+                 PERSIST_DIRECTORY)
+from agent_tools import with_timeout
+from web_search import web_search, web_search_tool
+from bm25_index import BM25_INDEX_FILE
+from embedding_cache import cached_openai_embeddings
+from answer_cache import ANSWER_CACHE_ENABLED, SemanticAnswerCache, is_context_free
+from conversation_store import ConversationStore, new_session_id
+from context_window import HistorySummarizer, assemble_context
+from prompts import react_prompt, react_prompt_chunks
+from telemetry import configure_logging, instrument, span, tracing_config
+from token_usage import (SESSION_TOKEN_BUDGET, TOKEN_BUDGET_MODE, TOKEN_USAGE_HEADER, UsageCallbackHandler,
+                         budget_exceeded_total, over_budget, usage_header)
+from fastapi import FastAPI, Request, Response, BackgroundTasks, HTTPException
 from pydantic import BaseModel
-import json
-from translate_text import detect_and_translate
+from typing import Optional
+from translate_text import SENTENCE_END_RE, adetect_and_translate, translate, translation_stats
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 
 # Allow all origins (for development)
 
@@ -17,64 +33,348 @@ from fastapi.middleware.cors import CORSMiddleware
 # Load environment variables
 
 
+# Tag log lines with the request ID that /metrics spans and trace logs are keyed by
+configure_logging()
+logger = logging.getLogger(__name__)
+
 # Initialize ChatOpenAI with the correct model
 # Note: As of March 2025, gpt-4o-mini is available (it was released after July 2024)
 model_openai = ChatOpenAI(
     model="gpt-4o-mini",
+    # Report token usage on streamed responses too (/ask/stream), for token accounting
+    stream_usage=True,
+)
+
+# Tavily search behind a TTL cache that also coalesces concurrent identical queries
+tavily_tool = web_search_tool
+
+# Create React agent. Several tool calls in one step (e.g. documents and web search) run concurrently,
+# each cut off after its TOOL_TIMEOUT_SECONDS
+agent_tools = [with_timeout(tavily_tool), with_timeout(retriever_tool)]
+react_agent = create_react_agent(
+    model=model_openai.bind_tools(agent_tools, parallel_tool_calls=True),
+    tools=agent_tools,
 )
 
-# Initialize Tavily search tool
-tavily_tool = TavilySearchResults(
-    max_results=3,
-    search_depth="basic",
+# The agent answers from raw excerpts when retriever_tool returns chunks instead of an answer
+agent_prompt = react_prompt_chunks if RAG_TOOL_MODE == "chunks" else react_prompt
+
+# Pre-warm the retrieval engine with a dummy query at startup
+RAG_WARMUP = os.getenv("RAG_WARMUP", "true").lower() == "true"
+
+# Per-session conversation history
+conversation_store = ConversationStore()
+history_summarizer = HistorySummarizer(conversation_store, ChatOpenAI(model="gpt-4o-mini", temperature=0))
+CONV_PURGE_INTERVAL_SECONDS = int(os.getenv("CONV_PURGE_INTERVAL_SECONDS", "3600"))
+
+# Answers to standalone questions, reused for near-duplicate questions until the index is rebuilt
+answer_cache = SemanticAnswerCache(
+    cached_openai_embeddings(model="text-embedding-3-small", dimensions=1536),
+    index_marker=os.path.join(PERSIST_DIRECTORY, BM25_INDEX_FILE),
 )
 
-# Create React agent
-react_agent = create_react_agent(model=model_openai, tools=[tavily_tool, retriever_tool])
+async def purge_expired_sessions():
+    while True:
+        try:
+            await asyncio.to_thread(conversation_store.purge_expired)
+            await asyncio.to_thread(web_search.purge_expired)
+        except Exception as e:
+            logger.error(f"Failed to purge expired sessions: {e}")
+        await asyncio.sleep(CONV_PURGE_INTERVAL_SECONDS)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the retrieval chain once, off the event loop, before serving traffic
+    try:
+        await asyncio.to_thread(retrieval_engine.start)
+        if RAG_WARMUP:
+            await asyncio.to_thread(retrieval_engine.warm_up)
+    except Exception as e:
+        # Keep serving; retriever_tool retries the build lazily and /health reports the error
+        logger.error(f"Retrieval engine failed to start: {e}")
+    purge_task = asyncio.create_task(purge_expired_sessions())
+    yield
+    purge_task.cancel()
+
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Change this to specific origins in production
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Session-ID", "X-Prompt-Tokens-Saved", "X-Answer-Cache", "X-Request-ID",
+                    "X-Token-Usage", "X-Token-Budget"],
 )
+# Request IDs, per-stage spans and GET /metrics
+instrument(app)
 # Create a Pydantic model for the request body
 class QuestionRequest(BaseModel):
     question: str
+    # Omit to start a new conversation; the id is returned in the X-Session-ID header
+    session_id: Optional[str] = None
 
 @app.get("/welcome")
 async def welcome():
     return {"message": "Welcome to the Bank Documents QA System!"}
 
-@app.post("/ask")
-async def ask(request: QuestionRequest):
-    question,detect_leng = detect_and_translate(request.question,"en")
+@app.get("/health")
+async def health():
+    status = retrieval_engine.status()
+    return JSONResponse(
+        status_code=200 if status["ready"] else 503,
+        content={
+            "status": "ok" if status["ready"] else "unavailable",
+            "retrieval": status,
+            "answer_cache": answer_cache.stats(),
+            "web_search_cache": web_search.stats(),
+            "translation": translation_stats(),
+        },
+    )
+
+async def lookup_cached_answer(question: str):
+    """(cacheable, question vector, cached answer or None) for an English question."""
+    # Only questions that don't lean on earlier turns may be answered from the cache
+    cacheable = ANSWER_CACHE_ENABLED and is_context_free(question)
+    if not cacheable:
+        return False, None, None
+    try:
+        with span("answer_cache") as record:
+            question_vector = await answer_cache.embed(question)
+            answer = answer_cache.lookup(question_vector)
+            record["hit"] = answer is not None
+        return True, question_vector, answer
+    except Exception as e:
+        logger.warning(f"Answer cache lookup failed: {e}")
+        return False, None, None
+
+async def agent_messages(session_id: str, question: str):
+    """System prompt, this session's history within the context budget and the new question."""
     messages=[]
-    messages.append(SystemMessage(content=react_prompt))
-    if not os.path.exists("conv_history.json"):
-        with open("conv_history.json", "w", encoding="utf-8") as file:
-            #json.dump( [],file)
-            pass
-    with open("conv_history.json", "r", encoding="utf-8") as file:
-        data = json.load(file) 
-    for entry in data:
-        messages.append(HumanMessage(content=entry["Human"]))
-        messages.append(AIMessage(content=entry["AI"]))
-    messages.append(HumanMessage(content=request.question))
-    res = react_agent.invoke({"messages":messages})
-    print(res)
-     # Store the conversation in memory
-    conversation_entry = {"Human": request.question, "AI": res["messages"][-1].content}
-    data.append(conversation_entry)
-
-    # Write updated history to JSON file
-    with open("conv_history.json", "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4)
-    result,detect_leng = detect_and_translate(res["messages"][-1].content,detect_leng)
+    messages.append(SystemMessage(content=agent_prompt))
+    with span("history") as record:
+        data = await asyncio.to_thread(conversation_store.history, session_id)
+        summary, covered_turns = await asyncio.to_thread(conversation_store.get_summary, session_id)
+        # Recent turns verbatim within the token budget, older ones as a cached summary
+        history_messages, context_stats = assemble_context(data, summary, covered_turns)
+        record["turns"] = len(data)
+    messages.extend(history_messages)
+    logger.info(f"History context for session {session_id}: {context_stats}")
+    messages.append(HumanMessage(content=question))
+    return messages, context_stats
+
+async def check_token_budget(session_id: str) -> tuple[dict, bool]:
+    """(session's token usage so far, whether to degrade); raises 429 if over budget in reject mode."""
+    session_usage = await asyncio.to_thread(conversation_store.get_usage, session_id)
+    if not over_budget(session_usage):
+        return session_usage, False
+    action = "degrade" if TOKEN_BUDGET_MODE == "degrade" else "reject"
+    budget_exceeded_total.inc(action=action)
+    if action == "reject":
+        raise HTTPException(
+            status_code=429,
+            detail=f"Session {session_id} has used its budget of {SESSION_TOKEN_BUDGET} tokens; start a new session",
+        )
+    return session_usage, True
+
+async def degraded_answer(question: str, usage: UsageCallbackHandler) -> str:
+    """Answer an over-budget session with a single retrieval chain call: no agent loop, history or web search."""
+    with span("degraded_answer"):
+        return await answer_question(question, config=tracing_config(usage))
+
+async def record_usage(session_id: str, usage: UsageCallbackHandler, session_usage: dict) -> dict:
+    """Add this request's tokens to the session; returns the session's new totals."""
+    if usage.usage["llm_calls"]:
+        await asyncio.to_thread(conversation_store.add_usage, session_id, usage.usage)
+    return {key: session_usage[key] + usage.usage[key] for key in usage.usage}
+
+@app.post("/ask")
+async def ask(request: QuestionRequest, response: Response, background_tasks: BackgroundTasks):
+    session_id = request.session_id or new_session_id()
+    response.headers["X-Session-ID"] = session_id
+    session_usage, degraded = await check_token_budget(session_id)
+    # Counts every LLM call of this request: the agent's steps and the chain inside retriever_tool
+    usage = UsageCallbackHandler()
+    with span("translate_question"):
+        question,detect_leng = await adetect_and_translate(request.question,"en")
+    cacheable, question_vector, answer = await lookup_cached_answer(question)
+    response.headers["X-Answer-Cache"] = "bypass" if not cacheable else "hit" if answer is not None else "miss"
+    if answer is None and degraded:
+        response.headers["X-Token-Budget"] = "degraded"
+        answer = await degraded_answer(question, usage)
+    elif answer is None:
+        messages, context_stats = await agent_messages(session_id, request.question)
+        response.headers["X-Prompt-Tokens-Saved"] = str(context_stats["tokens_saved"])
+        # LLM steps, tool calls and retriever searches become child spans of "agent"
+        with span("agent"):
+            # Documents for the question are fetched while the model plans its first step
+            speculate(question)
+            try:
+                res = await react_agent.ainvoke({"messages":messages}, config=tracing_config(usage))
+            finally:
+                end_speculation()
+        answer = res["messages"][-1].content
+        # Only an answer given without history is safe to serve another session; cached
+        # before back-translation so every language can reuse it
+        if cacheable and context_stats["turns"] == 0:
+            answer_cache.store(question, question_vector, answer)
+    session_usage = await record_usage(session_id, usage, session_usage)
+    if TOKEN_USAGE_HEADER:
+        response.headers["X-Token-Usage"] = usage_header(usage.usage, session_usage)
+    # Store the turn under this session only
+    with span("store"):
+        await asyncio.to_thread(conversation_store.append, session_id, request.question, answer)
+    # Fold turns that just left the window into the summary after the response is sent
+    if not degraded:
+        background_tasks.add_task(history_summarizer.refresh, session_id)
+    with span("translate_answer"):
+        result,detect_leng = await adetect_and_translate(answer,detect_leng)
     return result
 
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def pop_sentences(buffer: str):
+    """Split finished sentences off the front of a streamed buffer: (sentences, rest)."""
+    sentences, pos = [], 0
+    for match in SENTENCE_END_RE.finditer(buffer):
+        sentences.append(buffer[pos:match.end()])
+        pos = match.end()
+    return sentences, buffer[pos:]
+
+@app.post("/ask/stream")
+async def ask_stream(request: QuestionRequest):
+    """Like /ask, but streams agent progress and the answer as server-sent events.
+
+    Events: ``session`` first, ``progress`` as the agent starts and tools run,
+    ``token`` with answer text in the user's language (translated a sentence
+    at a time) as it is generated, then ``done`` (with the request's token usage) once the turn
+    is stored, or ``error``.
+    """
+    session_id = request.session_id or new_session_id()
+    background_tasks = BackgroundTasks()
+    # Checked before streaming starts, so an over-budget session in reject mode gets a plain 429
+    session_usage, degraded = await check_token_budget(session_id)
+    usage = UsageCallbackHandler()
+
+    async def events():
+        pending = deque()
+        yield sse("session", {"session_id": session_id})
+        try:
+            with span("translate_question"):
+                question,detect_leng = await adetect_and_translate(request.question,"en")
+            cacheable, question_vector, answer = await lookup_cached_answer(question)
+            # Answer text is sent as the model writes it: English chunk by chunk, other languages
+            # a sentence at a time, translated concurrently with generation and emitted in order
+            translating = detect_leng != "en"
+            # Pieces queued by the current agent step; once the step starts calling tools its
+            # text is only narration ("Let me look that up"), and what hasn't been sent is dropped
+            buffer, step, calling_tools = "", [], False
+
+            async def translate_piece(text: str) -> str:
+                body = text.rstrip()
+                with span("translate_answer"):
+                    translated = await asyncio.to_thread(translate, body, "auto", detect_leng) if body else ""
+                return translated + text[len(body):]
+
+            def make_piece(text: str):
+                return asyncio.create_task(translate_piece(text)) if translating else text
+
+            def queue_text(text: str):
+                pending.append(make_piece(text))
+
+            def ready():
+                return pending and (isinstance(pending[0], str) or pending[0].done())
+
+            def drop_step():
+                # The step's unsent pieces are the tail of the queue
+                for _ in range(min(len(step), len(pending))):
+                    piece = pending.pop()
+                    if not isinstance(piece, str):
+                        piece.cancel()
+
+            if answer is not None:
+                yield sse("progress", {"stage": "answer_cache", "status": "hit"})
+                queue_text(answer)
+            elif degraded:
+                yield sse("progress", {"stage": "token_budget", "status": "degraded"})
+                answer = await degraded_answer(question, usage)
+                queue_text(answer)
+            else:
+                messages, context_stats = await agent_messages(session_id, request.question)
+                yield sse("progress", {"stage": "agent", "status": "start", "tokens_saved": context_stats["tokens_saved"]})
+                speculate(question)
+                with span("agent"):
+                    async for event in react_agent.astream_events({"messages": messages}, config=tracing_config(usage), version="v2"):
+                        kind = event["event"]
+                        # Only the agent's own model streams to the user, not the LLM inside retriever_tool
+                        from_agent = event.get("metadata", {}).get("langgraph_node") == "agent"
+                        if kind == "on_tool_start":
+                            yield sse("progress", {"stage": "tool", "status": "start", "tool": event["name"]})
+                        elif kind == "on_tool_end":
+                            yield sse("progress", {"stage": "tool", "status": "end", "tool": event["name"]})
+                        elif kind == "on_chat_model_start" and from_agent:
+                            buffer, step, calling_tools = "", [], False
+                        elif kind == "on_chat_model_stream" and from_agent:
+                            chunk = event["data"]["chunk"]
+                            if chunk.tool_call_chunks and not calling_tools:
+                                calling_tools = True
+                                drop_step()
+                            if not calling_tools:
+                                buffer += chunk.content or ""
+                                # Finished sentences start translating while the model is still writing
+                                sentences, buffer = pop_sentences(buffer) if translating else ([buffer], "")
+                                for sentence in sentences:
+                                    if sentence:
+                                        step.append(make_piece(sentence))
+                                        pending.append(step[-1])
+                        elif kind == "on_chat_model_end" and from_agent:
+                            output = event["data"]["output"]
+                            if output.tool_calls:
+                                if not calling_tools:
+                                    drop_step()
+                            else:
+                                answer = output.content
+                                if buffer:
+                                    queue_text(buffer)
+                                elif not step and answer:
+                                    # Models that don't stream deliver the whole answer here
+                                    queue_text(answer)
+                            buffer, step, calling_tools = "", [], False
+                        while ready():
+                            piece = pending.popleft()
+                            yield sse("token", {"text": piece if isinstance(piece, str) else piece.result()})
+                if cacheable and answer and context_stats["turns"] == 0:
+                    answer_cache.store(question, question_vector, answer)
+            while pending:
+                piece = pending.popleft()
+                yield sse("token", {"text": piece if isinstance(piece, str) else await piece})
+            with span("store"):
+                await asyncio.to_thread(conversation_store.append, session_id, request.question, answer or "")
+            totals = await record_usage(session_id, usage, session_usage)
+            if not degraded:
+                background_tasks.add_task(history_summarizer.refresh, session_id)
+            done = {"session_id": session_id}
+            if TOKEN_USAGE_HEADER:
+                done["token_usage"] = {**usage.usage, "session_total": totals["input_tokens"] + totals["output_tokens"]}
+            yield sse("done", done)
+        except Exception as e:
+            logger.error(f"Streaming answer failed for session {session_id}: {e}")
+            yield sse("error", {"detail": str(e)})
+        finally:
+            end_speculation()
+            for piece in pending:
+                if not isinstance(piece, str):
+                    piece.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"X-Session-ID": session_id, "Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=background_tasks,
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="127.0.0.1", port=8000)
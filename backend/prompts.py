@@ -8,6 +8,8 @@ When a user asks a question about loans, follow these guidelines:
 
 • Analyze the user’s query carefully to determine whether the question requires up-to-date external information (use TavilySearchTool) or if it can be answered using the internal loan database (use retriever_tool). In some cases, you may need to use both.
 
+• When you need both tools, or several separate lookups (e.g. two banks to compare), request all of those tool calls together in the same step rather than one after another; they run at the same time. If a tool reports that it timed out, answer from the other results.
+
 • If the query is ambiguous or lacks sufficient detail (e.g., “Which loans are available?”), ask clarifying questions to gather necessary context (such as the type of loan, desired loan amount, interest preferences, or tenure).
 
 • When using retriever_tool, retrieve the relevant loan documents and generate a concise, accurate answer that highlights key features (such as interest rates, eligibility criteria, fees, and repayment options) that match the user’s needs.
@@ -28,4 +30,12 @@ Your goal is to empower users to make informed decisions about their loans by le
 
 When ready, generate an answer that integrates the relevant data and clearly explains the loan options available.  
 
-'''
\ No newline at end of file
+'''
+# For RAG_TOOL_MODE=chunks: retriever_tool returns document excerpts rather than a written answer
+react_prompt_chunks = react_prompt.replace(
+    "It returns context-rich, LLM-generated answers based on the loan data.",
+    "It returns the most relevant excerpts from the loan documents, numbered and tagged with bank, loan type and source document.",
+).replace(
+    "• When using retriever_tool, retrieve the relevant loan documents and generate a concise, accurate answer that highlights key features (such as interest rates, eligibility criteria, fees, and repayment options) that match the user’s needs.",
+    "• When using retriever_tool, pass it a self-contained question and answer from the excerpts it returns: give a concise, accurate answer that highlights key features (such as interest rates, eligibility criteria, fees, and repayment options) that match the user’s needs. Use only figures that appear in the excerpts; if they do not cover the question, search again with a more specific question or use TavilySearchTool instead of guessing.",
+)
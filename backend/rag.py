@@ -1,11 +1,26 @@
 import os
+import re
+import asyncio
+import threading
+import time
 from dotenv import load_dotenv
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+from langchain_openai import ChatOpenAI
 from langchain_community.vectorstores import Chroma
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
 from langchain.chains import ConversationalRetrievalChain
 from langchain.agents import tool
+from embedding_cache import cached_openai_embeddings
+from bank_metadata import detect_filter
+from bm25_index import BM25_INDEX_FILE, BM25Index, reciprocal_rank_fusion
+from context_window import count_tokens
+from telemetry import registry, span
 
 import logging
+from contextvars import ContextVar
+from typing import Optional
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -14,11 +29,85 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+PERSIST_DIRECTORY = os.getenv("RAG_PERSIST_DIRECTORY", "embeddings_db")
+WARMUP_QUERY = os.getenv("RAG_WARMUP_QUERY", "What is the interest rate on a home loan?")
+
+# Hybrid retrieval: candidates fetched from each side and their weights in rank fusion
+RAG_HYBRID = os.getenv("RAG_HYBRID", "true").lower() == "true"
+RAG_CANDIDATES = int(os.getenv("RAG_CANDIDATES", "10"))
+RAG_VECTOR_WEIGHT = float(os.getenv("RAG_VECTOR_WEIGHT", "1.0"))
+RAG_BM25_WEIGHT = float(os.getenv("RAG_BM25_WEIGHT", "1.0"))
+RAG_RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "3"))
+
+# What retriever_tool returns: "answer" runs the retrieval chain and its own LLM call;
+# "chunks" returns the top RAG_TOP_K excerpts (within RAG_CHUNK_TOKEN_BUDGET tokens) for the agent to answer from
+RAG_TOOL_MODE = os.getenv("RAG_TOOL_MODE", "answer").lower()
+RAG_CHUNK_TOKEN_BUDGET = int(os.getenv("RAG_CHUNK_TOKEN_BUDGET", "1500"))
+
+# Start retrieval for the user's question alongside the agent's first LLM step, and hand the
+# documents to retriever_tool if it asks for a similar enough query (word overlap, same bank/loan type)
+RAG_SPECULATIVE_RETRIEVAL = os.getenv("RAG_SPECULATIVE_RETRIEVAL", "false").lower() == "true"
+RAG_SPECULATIVE_MIN_OVERLAP = float(os.getenv("RAG_SPECULATIVE_MIN_OVERLAP", "0.6"))
+
+# Markup in the scraped corpus that costs tokens without adding facts: footnote markers, HTML tags
+CHUNK_NOISE_RE = re.compile(r"\[\^\d+\]|<[^>]+>|⁂")
+
+class HybridRetriever(BaseRetriever):
+    """BM25 + vector search fused with reciprocal rank fusion, pre-filtered by bank and loan type.
+
+    Chunks carry ``bank`` and ``loan_type`` metadata from ingestion, so a question
+    about HDFC gold loans only competes against HDFC gold-loan chunks. Questions
+    without a recognisable bank or loan type, or whose filter matches nothing,
+    fall back to searching every chunk. The lexical side catches exact tokens
+    (scheme names, "CBLR", percentages) that dense similarity tends to miss.
+    """
+
+    vectorstore: VectorStore
+    bm25: Optional[BM25Index] = None
+    k: int = 3
+    candidates: int = RAG_CANDIDATES
+    vector_weight: float = RAG_VECTOR_WEIGHT
+    bm25_weight: float = RAG_BM25_WEIGHT
+    rrf_k: int = RAG_RRF_K
+
+    @property
+    def hybrid(self) -> bool:
+        return self.bm25 is not None and self.bm25_weight > 0
+
+    def _fuse(self, query: str, vector_docs: list[Document], where: Optional[dict]) -> list[Document]:
+        if not self.hybrid:
+            return vector_docs[:self.k]
+        lexical_docs = [doc for doc, _ in self.bm25.search(query, k=self.candidates, where=where)]
+        return reciprocal_rank_fusion(
+            [(vector_docs, self.vector_weight), (lexical_docs, self.bm25_weight)], k=self.k, rrf_k=self.rrf_k
+        )
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        fetch_k = self.candidates if self.hybrid else self.k
+        where = detect_filter(query)
+        if where:
+            docs = self._fuse(query, self.vectorstore.similarity_search(query, k=fetch_k, filter=where), where)
+            if docs:
+                logger.info(f"Retrieved {len(docs)} chunks with filter {where}")
+                return docs
+        return self._fuse(query, self.vectorstore.similarity_search(query, k=fetch_k), None)
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun) -> list[Document]:
+        fetch_k = self.candidates if self.hybrid else self.k
+        where = detect_filter(query)
+        if where:
+            docs = self._fuse(query, await self.vectorstore.asimilarity_search(query, k=fetch_k, filter=where), where)
+            if docs:
+                logger.info(f"Retrieved {len(docs)} chunks with filter {where}")
+                return docs
+        return self._fuse(query, await self.vectorstore.asimilarity_search(query, k=fetch_k), None)
+
 def load_retrieval_chain(persist_directory: str = "embeddings_db"):
     """Load the vector store and create a retrieval chain."""
     try:
-        # Initialize embeddings
-        embeddings = OpenAIEmbeddings(
+        # Initialize embeddings; repeated questions are served from the on-disk cache
+        embeddings = cached_openai_embeddings(
             model="text-embedding-3-small",
             dimensions=1536
         )
@@ -29,10 +118,14 @@ def load_retrieval_chain(persist_directory: str = "embeddings_db"):
             embedding_function=embeddings
         )
         
-        # Create a retriever
-        retriever = vectorstore.as_retriever(
-            search_type="similarity",
-            search_kwargs={"k": 3}  # Return top 3 most relevant chunks
+        # Lexical index built by process_bank_docs.py, loaded once with the chain
+        bm25 = BM25Index.load(os.path.join(persist_directory, BM25_INDEX_FILE)) if RAG_HYBRID else None
+
+        # Create a hybrid retriever that pre-filters by the bank / loan type in the question
+        retriever = HybridRetriever(
+            vectorstore=vectorstore,
+            bm25=bm25,
+            k=RAG_TOP_K  # Most relevant chunks returned
         )
         
         # Initialize the language model
@@ -57,29 +150,191 @@ def load_retrieval_chain(persist_directory: str = "embeddings_db"):
         logger.error(f"Error loading retrieval chain: {str(e)}")
         raise
 
-@tool
-def retriever_tool(question: str)->str:
-    '''
-    Performs RAG on the database of loans and returns the final llm generated response
-    Input: question/instruction from react agent
-    Output: Reponse to the input after RAG
+class RetrievalEngine:
+    """Long-lived retrieval chain shared by every retriever_tool call.
 
-    '''
+    The embeddings client, the Chroma collection and the chain are built once
+    (normally at FastAPI startup) instead of on every tool invocation.
+    """
+
+    def __init__(self, persist_directory: str = PERSIST_DIRECTORY):
+        self.persist_directory = persist_directory
+        self.chain = None
+        self.ready = False
+        self.error = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Build the chain if it does not exist yet and return it."""
+        if self.chain is not None:
+            return self.chain
+        with self._lock:
+            if self.chain is None:
+                started = time.perf_counter()
+                try:
+                    self.chain = load_retrieval_chain(self.persist_directory)
+                except Exception as e:
+                    self.error = str(e)
+                    raise
+                self.error = None
+                # Also covers a lazy build by retriever_tool after a failed startup
+                self.ready = True
+                self.load_seconds = time.perf_counter() - started
+                logger.info(f"Retrieval engine loaded in {self.load_seconds:.2f}s")
+        return self.chain
+
+    def warm_up(self, query: str = WARMUP_QUERY):
+        """Run a retrieval-only dummy query so the first real user skips the cold start."""
+        chain = self.start()
+        started = time.perf_counter()
+        try:
+            chain.retriever.invoke(query)
+        except Exception as e:
+            self.ready = False
+            self.error = str(e)
+            raise
+        self.warmup_seconds = time.perf_counter() - started
+        self.ready = True
+        logger.info(f"Retrieval engine warmed up in {self.warmup_seconds:.2f}s")
+
+    def status(self) -> dict:
+        """Readiness information for the health endpoint."""
+        embeddings = self.chain.retriever.vectorstore.embeddings if self.chain is not None else None
+        return {
+            "ready": self.ready,
+            "loaded": self.chain is not None,
+            "persist_directory": self.persist_directory,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "error": self.error,
+            "embedding_cache": embeddings.stats() if hasattr(embeddings, "stats") else None,
+        }
+
+# Shared by every request in the process
+retrieval_engine = RetrievalEngine()
+
+def compact_text(text: str) -> str:
+    return " ".join(CHUNK_NOISE_RE.sub(" ", text).split())
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text at a word boundary so it fits in max_tokens."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    words = text.split()
+    # Start from a characters-per-token estimate and shrink until it fits
+    keep = min(len(words), max(1, max_tokens * 3 // 4))
+    while keep > 1 and count_tokens(" ".join(words[:keep]) + " …") > max_tokens:
+        keep = keep * 9 // 10
+    return " ".join(words[:keep]) + " …"
+
+def format_chunks(docs: list[Document], token_budget: int = RAG_CHUNK_TOKEN_BUDGET) -> str:
+    """Number the chunks best first, tag each with bank, loan type and source, and stop at the token budget.
+
+    The chunk that crosses the budget is truncated; lower-ranked ones are dropped.
+    """
+    blocks, used, seen = [], 0, set()
+    for doc in docs:
+        content = compact_text(doc.page_content)
+        if not content or content in seen:
+            continue
+        seen.add(content)
+        source = os.path.basename(doc.metadata.get("source", "")) or "unknown"
+        header = (f"[{len(blocks) + 1}] bank: {doc.metadata.get('bank') or 'unknown'} | "
+                  f"loan type: {doc.metadata.get('loan_type') or 'unknown'} | source: {source}")
+        remaining = token_budget - used - count_tokens(header) - 1
+        if remaining < 20:
+            break
+        content = truncate_to_tokens(content, remaining)
+        blocks.append(f"{header}\n{content}")
+        used += count_tokens(blocks[-1]) + 1
+    if not blocks:
+        return "No matching excerpts were found in the loan documents."
+    return "\n\n".join(blocks)
+
+WORD_RE = re.compile(r"\w+")
+speculative_outcomes = registry.counter(
+    "speculative_retrievals_total", "Speculative retrievals by outcome (used, unused, failed)", ("outcome",)
+)
+# This request's speculative retrievals: (question, task) pairs, set by speculate()
+_speculations: ContextVar[Optional[list]] = ContextVar("speculations", default=None)
+
+def queries_match(a: str, b: str, min_overlap: float = RAG_SPECULATIVE_MIN_OVERLAP) -> bool:
+    """True if two queries would retrieve much the same chunks: same filter and enough shared words."""
+    words_a, words_b = set(WORD_RE.findall(a.lower())), set(WORD_RE.findall(b.lower()))
+    if not words_a or not words_b or detect_filter(a) != detect_filter(b):
+        return False
+    return len(words_a & words_b) / len(words_a | words_b) >= min_overlap
+
+async def _speculative_fetch(retriever: BaseRetriever, question: str) -> list[Document]:
+    with span("speculative_retrieval"):
+        return await retriever.ainvoke(question)
+
+def speculate(question: str):
+    """Start retrieving documents for the question in the background for this request.
+
+    Call it just before running the agent; ``end_speculation`` must follow once
+    the agent is done. Does nothing unless RAG_SPECULATIVE_RETRIEVAL is on and
+    the engine is loaded.
+    """
+    if not RAG_SPECULATIVE_RETRIEVAL or retrieval_engine.chain is None:
+        return
+    task = asyncio.create_task(_speculative_fetch(retrieval_engine.chain.retriever, question))
+    speculations = _speculations.get()
+    if speculations is None:
+        _speculations.set(speculations := [])
+    speculations.append((question, task))
+
+def end_speculation():
+    """Cancel this request's speculative retrievals that no tool call used."""
+    for _, task in _speculations.get() or []:
+        task.cancel()
+        speculative_outcomes.inc(outcome="unused")
+    _speculations.set(None)
+
+async def take_speculative(question: str) -> Optional[list[Document]]:
+    """Documents from a speculative retrieval matching the query, or None (then retrieve as usual)."""
+    speculations = _speculations.get()
+    for i, (speculated, task) in enumerate(speculations or []):
+        if queries_match(speculated, question):
+            del speculations[i]
+            try:
+                docs = await task
+            except Exception as e:
+                logger.warning(f"Speculative retrieval failed, retrieving again: {e}")
+                speculative_outcomes.inc(outcome="failed")
+                return None
+            speculative_outcomes.inc(outcome="used")
+            return docs
+    return None
+
+async def retrieve_chunks(question: str) -> str:
+    """Top chunks for the question, formatted for the agent to answer from; no LLM call."""
+    docs = await take_speculative(question)
+    if docs is None:
+        chain = retrieval_engine.chain or await asyncio.to_thread(retrieval_engine.start)
+        docs = await chain.retriever.ainvoke(question)
+    logger.info(f"retriever_tool sources: {', '.join(doc.metadata.get('source', 'Unknown source') for doc in docs)}")
+    return format_chunks(docs)
+
+async def answer_question(question: str, config: Optional[dict] = None) -> str:
+    """Answer from the loan documents with the retrieval chain's own LLM call."""
     # Check for OpenAI API key
     if not os.getenv("OPENAI_API_KEY"):
         raise ValueError("Please set OPENAI_API_KEY in your environment variables or .env file")
     
-    # Load the retrieval chain
-    chain = load_retrieval_chain()
-    
-    # print("\nWelcome to the Bank Documents QA System!")
-    # print("Type 'exit' to end the conversation.\n")
-    
-    # Get user question
+    # Reuse the process-wide retrieval chain (only builds it if startup failed)
+    chain = retrieval_engine.chain or await asyncio.to_thread(retrieval_engine.start)
 
-    # Get response from the chain
-    
-    result = chain.invoke({"question": question, "chat_history": []})
+    docs = await take_speculative(question)
+    if docs is not None:
+        # Documents are already here; run only the chain's answering step
+        output = await chain.combine_docs_chain.ainvoke({"input_documents": docs, "question": question}, config=config)
+        result = {"answer": output[chain.combine_docs_chain.output_key], "source_documents": docs}
+    else:
+        # Get response from the chain without blocking the event loop
+        result = await chain.ainvoke({"question": question, "chat_history": []}, config=config)
 
     # Ensure correct unpacking of results
     if isinstance(result, dict) and "answer" in result and "source_documents" in result:
@@ -90,19 +345,28 @@ def retriever_tool(question: str)->str:
         answer = "Sorry, an error occurred."
         source_docs = []
 
-    # Print the answer
-    # print("\nAnswer:", answer)
-
-    # Print source documents if available
     if source_docs:
-        print("\nSources:")
-        for i, doc in enumerate(source_docs, 1):
-            source = doc.metadata.get('source', 'Unknown source')
-            content = doc.page_content[:200] + "..." if len(doc.page_content) > 200 else doc.page_content
-            # print(f"\n{i}. From {source}:")
-            # print(f"   {content}")
+        sources = ", ".join(doc.metadata.get('source', 'Unknown source') for doc in source_docs)
+        logger.info(f"retriever_tool sources: {sources}")
 
-        # Update chat history
+    return answer
 
-        return answer
-        
+@tool
+async def retriever_tool(question: str)->str:
+    '''
+    Performs RAG on the database of loans and returns the final llm generated response
+    Input: question/instruction from react agent
+    Output: Reponse to the input after RAG
+
+    '''
+    if RAG_TOOL_MODE == "chunks":
+        return await retrieve_chunks(question)
+    return await answer_question(question)
+
+if RAG_TOOL_MODE == "chunks":
+    # The agent reads the description to decide how to use the tool's output
+    retriever_tool.description = (
+        "Searches the database of SBI, IOB and HDFC loan documents and returns the most relevant excerpts, "
+        "numbered and tagged with bank, loan type and source document. "
+        "Input: a self-contained question about a bank's loans. Output: excerpts to answer from."
+    )
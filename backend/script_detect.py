@@ -0,0 +1,71 @@
+import os
+from typing import Optional
+import numpy as np
+from langdetect import DetectorFactory, detect
+from langdetect.lang_detect_exception import LangDetectException
+
+# langdetect samples randomly; a fixed seed makes the Latin-script fallback deterministic
+DetectorFactory.seed = 0
+
+# An Indic script needs at least this share of the letters to decide the language,
+# so "HDFC होम लोन" is Hindi but an English question quoting one Hindi word is not
+SCRIPT_MIN_SHARE = float(os.getenv("SCRIPT_MIN_SHARE", "0.3"))
+
+# Non-overlapping, sorted [start, end) code point ranges and the language each script implies.
+# Devanagari is read as Hindi, Bengali script as Bengali; "latin" and "arabic" are shared by
+# several languages and are left to langdetect.
+SCRIPT_RANGES = [
+    (0x0041, 0x005B, "latin"),
+    (0x0061, 0x007B, "latin"),
+    (0x00C0, 0x0250, "latin"),
+    (0x0600, 0x0700, "arabic"),
+    (0x0900, 0x0980, "hi"),
+    (0x0980, 0x0A00, "bn"),
+    (0x0A00, 0x0A80, "pa"),
+    (0x0A80, 0x0B00, "gu"),
+    (0x0B00, 0x0B80, "or"),
+    (0x0B80, 0x0C00, "ta"),
+    (0x0C00, 0x0C80, "te"),
+    (0x0C80, 0x0D00, "kn"),
+    (0x0D00, 0x0D80, "ml"),
+]
+AMBIGUOUS_SCRIPTS = {"latin", "arabic"}
+
+_EDGES = np.array([edge for start, end, _ in SCRIPT_RANGES for edge in (start, end)], dtype=np.uint32)
+_LABELS = [label for _, _, label in SCRIPT_RANGES]
+
+def script_histogram(text: str) -> dict:
+    """Letters per script label; digits, punctuation and other scripts are not counted."""
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    # Odd positions in the edge list fall inside a range: position 2i + 1 is range i
+    positions = np.searchsorted(_EDGES, codes, side="right")
+    inside = positions[positions % 2 == 1] // 2
+    counts = np.bincount(inside, minlength=len(SCRIPT_RANGES))
+    histogram = {}
+    for label, count in zip(_LABELS, counts.tolist()):
+        if count:
+            histogram[label] = histogram.get(label, 0) + count
+    return histogram
+
+def detect_script(text: str) -> Optional[str]:
+    """Language implied by the dominant Indic script, or None when the script doesn't decide it."""
+    histogram = script_histogram(text)
+    letters = sum(histogram.values())
+    indic = {label: count for label, count in histogram.items() if label not in AMBIGUOUS_SCRIPTS}
+    if not indic:
+        return None
+    label, count = max(indic.items(), key=lambda item: item[1])
+    return label if count / letters >= SCRIPT_MIN_SHARE else None
+
+def detect_language(text: str) -> Optional[str]:
+    """Language code of ``text``: by script for Indic text, by langdetect for Latin and Arabic.
+
+    Returns None when the text has no letters to go on.
+    """
+    language = detect_script(text)
+    if language is not None:
+        return language
+    try:
+        return detect(text)
+    except LangDetectException:
+        return None
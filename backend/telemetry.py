@@ -0,0 +1,322 @@
+import os
+import json
+import time
+import uuid
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+# Log one JSON line with every span of a request (a trace) when it finishes
+TRACE_LOG_ENABLED = os.getenv("TRACE_LOG_ENABLED", "true").lower() == "true"
+# Histogram bucket upper bounds in seconds, from cache lookups to slow LLM calls
+LATENCY_BUCKETS = tuple(float(b) for b in os.getenv(
+    "METRICS_LATENCY_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30"
+).split(","))
+REQUEST_ID_HEADER = "X-Request-ID"
+LOG_FORMAT = "%(asctime)s - %(levelname)s - [%(request_id)s] %(name)s - %(message)s"
+
+# Set by TelemetryMiddleware for the lifetime of one HTTP request
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+trace_var: ContextVar[Optional[list]] = ContextVar("trace", default=None)
+parent_span_var: ContextVar[Optional[str]] = ContextVar("parent_span", default=None)
+
+_record_factory = logging.getLogRecordFactory()
+
+def _record_with_request_id(*args, **kwargs):
+    record = _record_factory(*args, **kwargs)
+    record.request_id = request_id_var.get()
+    return record
+
+# Every log record carries the request it was emitted for, usable as %(request_id)s in formats
+logging.setLogRecordFactory(_record_with_request_id)
+
+def configure_logging(level=logging.INFO):
+    """Prefix log lines with the request ID so they can be matched to the request's trace."""
+    root = logging.getLogger()
+    if not root.handlers:
+        logging.basicConfig(level=level)
+    for handler in root.handlers:
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {value:g}")
+        return lines
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus text format."""
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), sum
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames + ('le',), key + (le,))} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total:.6f}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def counter(self, name: str, help: str, labelnames=()) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+http_request_seconds = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency, including streamed bodies", ("method", "route", "status")
+)
+stage_seconds = registry.histogram(
+    "stage_duration_seconds", "Time spent in each stage of a request", ("stage",)
+)
+stage_errors = registry.counter("stage_errors_total", "Stages that raised an exception", ("stage",))
+
+def _finish_span(spans: Optional[list], record: dict, started: float, error: Optional[BaseException]):
+    elapsed = time.perf_counter() - started
+    stage_seconds.observe(elapsed, stage=record["name"])
+    if error is not None:
+        stage_errors.inc(stage=record["name"])
+        record["error"] = repr(error)
+    record["duration_ms"] = round(elapsed * 1000, 2)
+    if spans is not None:
+        spans.append(record)
+
+def _new_span(name: str, parent: Optional[str], attributes: dict) -> dict:
+    return {"name": name, "span_id": uuid.uuid4().hex[:16], "parent": parent,
+            "start": time.time(), **attributes}
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time a stage of the current request; the histogram is updated even outside a request.
+
+    Yields the span record, so callers can add attributes (cache hit, item counts, ...).
+    """
+    record = _new_span(name, parent_span_var.get(), attributes)
+    spans = trace_var.get()
+    token = parent_span_var.set(record["span_id"])
+    started = time.perf_counter()
+    error = None
+    try:
+        yield record
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        parent_span_var.reset(token)
+        _finish_span(spans, record, started, error)
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Turns LangChain callbacks into spans: every LLM call, tool call and retriever search.
+
+    Pass one per request in the run config; callbacks reach nested runs such as
+    the chain inside retriever_tool. LLM and retriever spans are named after the
+    tool that ran them (``llm:retriever_tool``) or ``agent`` for the agent's own
+    model, and tool spans ``tool:<name>``.
+    """
+
+    run_inline = True
+
+    def __init__(self, spans: Optional[list] = None, parent: Optional[str] = None):
+        self.spans = spans if spans is not None else trace_var.get()
+        self.parent = parent if parent is not None else parent_span_var.get()
+        self._parents = {}
+        self._tools = {}
+        self._open = {}
+
+    def _owner(self, run_id) -> str:
+        while run_id is not None:
+            if run_id in self._tools:
+                return self._tools[run_id]
+            run_id = self._parents.get(run_id)
+        return "agent"
+
+    def _parent_span(self, run_id) -> Optional[str]:
+        run_id = self._parents.get(run_id)
+        while run_id is not None:
+            if run_id in self._open:
+                return self._open[run_id][0]["span_id"]
+            run_id = self._parents.get(run_id)
+        return self.parent
+
+    def _start(self, name: str, run_id, parent_run_id, **attributes):
+        self._parents[run_id] = parent_run_id
+        self._open[run_id] = (_new_span(name, self._parent_span(run_id), attributes), time.perf_counter())
+
+    def _end(self, run_id, error: Optional[BaseException] = None, **attributes):
+        opened = self._open.pop(run_id, None)
+        if opened is not None:
+            record, started = opened
+            record.update(attributes)
+            _finish_span(self.spans, record, started, error)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        # Chains aren't spans, but their ids link LLM calls back to the tool that made them
+        self._parents[run_id] = parent_run_id
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        self._parents[run_id] = parent_run_id
+        self._start(f"llm:{self._owner(run_id)}", run_id, parent_run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        self._parents[run_id] = parent_run_id
+        self._start(f"llm:{self._owner(run_id)}", run_id, parent_run_id)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        attributes = {}
+        message = getattr(response.generations[0][0], "message", None) if response.generations and response.generations[0] else None
+        usage = getattr(message, "usage_metadata", None)
+        if usage:
+            attributes = {"input_tokens": usage.get("input_tokens", 0), "output_tokens": usage.get("output_tokens", 0)}
+        self._end(run_id, **attributes)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        self._tools[run_id] = name
+        self._start(f"tool:{name}", run_id, parent_run_id)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, **kwargs):
+        self._parents[run_id] = parent_run_id
+        self._start(f"retriever:{self._owner(run_id)}", run_id, parent_run_id)
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._end(run_id, documents=len(documents))
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+def tracing_config(*handlers) -> dict:
+    """Run config that records the agent's LLM, tool and retriever calls into the current trace.
+
+    Extra callback handlers (e.g. token accounting) are added alongside the tracer.
+    """
+    return {"callbacks": [TracingCallbackHandler(), *handlers]}
+
+class TelemetryMiddleware:
+    """ASGI middleware: request IDs, a trace per request, and latency histograms.
+
+    The request ID comes from the incoming X-Request-ID header or is generated,
+    is echoed in the response and tags every log record. Timing runs until the
+    last body chunk is sent, so streamed responses are measured in full.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(REQUEST_ID_HEADER.lower().encode(), b"").decode("latin-1")[:64] or uuid.uuid4().hex
+        spans = []
+        tokens = (request_id_var.set(request_id), trace_var.set(spans), parent_span_var.set(None))
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(REQUEST_ID_HEADER.lower().encode(), request_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            http_request_seconds.observe(elapsed, method=scope["method"], route=route_path, status=str(status))
+            if TRACE_LOG_ENABLED and spans:
+                logger.info(json.dumps({
+                    "request_id": request_id,
+                    "method": scope["method"],
+                    "route": route_path,
+                    "status": status,
+                    "duration_ms": round(elapsed * 1000, 2),
+                    "spans": spans,
+                }, default=str))
+            for var, token in zip((request_id_var, trace_var, parent_span_var), tokens):
+                var.reset(token)
+
+def instrument(app):
+    """Add TelemetryMiddleware and a Prometheus text-format GET /metrics to a FastAPI app."""
+    from fastapi.responses import PlainTextResponse
+
+    app.add_middleware(TelemetryMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+    return app
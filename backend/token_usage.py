@@ -0,0 +1,102 @@
+import os
+import json
+import logging
+from typing import Optional
+from langchain_core.callbacks import BaseCallbackHandler
+from telemetry import registry
+
+logger = logging.getLogger(__name__)
+
+# Tokens (input + output) one session may spend; 0 disables the budget
+SESSION_TOKEN_BUDGET = int(os.getenv("SESSION_TOKEN_BUDGET", "0"))
+# "reject" answers 429 once a session is over budget; "degrade" answers with one retrieval call, no agent or history
+TOKEN_BUDGET_MODE = os.getenv("TOKEN_BUDGET_MODE", "reject").lower()
+# Report each request's usage in the X-Token-Usage response header
+TOKEN_USAGE_HEADER = os.getenv("TOKEN_USAGE_HEADER", "false").lower() == "true"
+
+# USD per million tokens: input, cached input, output. TOKEN_PRICES (same JSON shape) overrides or adds models
+TOKEN_PRICES = {
+    "gpt-4o-mini": {"input": 0.15, "cached": 0.075, "output": 0.60},
+    "gpt-4o": {"input": 2.50, "cached": 1.25, "output": 10.00},
+}
+TOKEN_PRICES.update(json.loads(os.getenv("TOKEN_PRICES", "{}")))
+
+tokens_total = registry.counter("llm_tokens_total", "LLM tokens used, by model and kind", ("model", "kind"))
+cost_total = registry.counter("llm_cost_usd_total", "Estimated LLM cost in USD, by model", ("model",))
+budget_exceeded_total = registry.counter(
+    "token_budget_exceeded_total", "Requests from sessions over their token budget, by action", ("action",)
+)
+
+def empty_usage() -> dict:
+    return {"input_tokens": 0, "output_tokens": 0, "cached_tokens": 0, "llm_calls": 0, "cost_usd": 0.0}
+
+def price(model: str, input_tokens: int, cached_tokens: int, output_tokens: int) -> float:
+    # Dated snapshots ("gpt-4o-mini-2024-07-18") are priced like their base model
+    prices = TOKEN_PRICES.get(model) or next(
+        (p for name, p in sorted(TOKEN_PRICES.items(), key=lambda item: -len(item[0])) if model.startswith(name)), None
+    )
+    if prices is None:
+        return 0.0
+    uncached = max(0, input_tokens - cached_tokens)
+    return (uncached * prices["input"] + cached_tokens * prices.get("cached", prices["input"])
+            + output_tokens * prices["output"]) / 1_000_000
+
+def message_usage(message) -> Optional[tuple[int, int, int]]:
+    """(input, output, cached) tokens from an AIMessage's usage_metadata, or None if it has none."""
+    usage = getattr(message, "usage_metadata", None)
+    if not usage:
+        return None
+    cached = (usage.get("input_token_details") or {}).get("cache_read") or 0
+    return usage.get("input_tokens", 0), usage.get("output_tokens", 0), cached
+
+def _llm_output_usage(llm_output: Optional[dict]) -> Optional[tuple[int, int, int]]:
+    # Older integrations only report OpenAI's raw token_usage
+    usage = (llm_output or {}).get("token_usage")
+    if not usage:
+        return None
+    cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+    return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0), cached
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """Adds up token usage over every LLM call of one request, nested chains included.
+
+    Callbacks reach the LLM inside retriever_tool's ConversationalRetrievalChain
+    as well as the agent's own model, so ``usage`` covers both.
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self.usage = empty_usage()
+
+    def record(self, model: str, input_tokens: int, output_tokens: int, cached_tokens: int):
+        cost = price(model, input_tokens, cached_tokens, output_tokens)
+        self.usage["input_tokens"] += input_tokens
+        self.usage["output_tokens"] += output_tokens
+        self.usage["cached_tokens"] += cached_tokens
+        self.usage["llm_calls"] += 1
+        self.usage["cost_usd"] += cost
+        tokens_total.inc(input_tokens, model=model, kind="input")
+        tokens_total.inc(output_tokens, model=model, kind="output")
+        tokens_total.inc(cached_tokens, model=model, kind="cached")
+        cost_total.inc(cost, model=model)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        generation = response.generations[0][0] if response.generations and response.generations[0] else None
+        message = getattr(generation, "message", None)
+        counts = message_usage(message) or _llm_output_usage(response.llm_output)
+        if counts is None:
+            return
+        model = ((response.llm_output or {}).get("model_name")
+                 or (getattr(message, "response_metadata", None) or {}).get("model_name") or "unknown")
+        self.record(model, *counts)
+
+def usage_header(request_usage: dict, session_usage: dict) -> str:
+    return (
+        f"input={request_usage['input_tokens']}; output={request_usage['output_tokens']}; "
+        f"cached={request_usage['cached_tokens']}; cost_usd={request_usage['cost_usd']:.6f}; "
+        f"session_total={session_usage['input_tokens'] + session_usage['output_tokens']}"
+    )
+
+def over_budget(session_usage: dict, budget: int = SESSION_TOKEN_BUDGET) -> bool:
+    return budget > 0 and session_usage["input_tokens"] + session_usage["output_tokens"] >= budget
@@ -1,15 +1,97 @@
-from langdetect import detect
+import os
+import re
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from deep_translator import GoogleTranslator
+from script_detect import detect_language
+
+logger = logging.getLogger(__name__)
+
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "2048"))
+# Texts longer than this are split at sentence boundaries and the pieces translated in parallel
+TRANSLATION_BATCH_CHARS = int(os.getenv("TRANSLATION_BATCH_CHARS", "1000"))
+TRANSLATION_WORKERS = int(os.getenv("TRANSLATION_WORKERS", "4"))
+
+SENTENCE_END_RE = re.compile(r"(?<=[.!?।])[ \t]+|\n+")
+
+_local = threading.local()
+_pool = ThreadPoolExecutor(max_workers=TRANSLATION_WORKERS, thread_name_prefix="translate")
+_stats_lock = threading.Lock()
+_stats = {"calls": 0, "skipped": 0, "seconds": 0.0, "last_ms": 0.0}
+
+def _translator(source, target):
+    # GoogleTranslator keeps per-call state on the instance, so reuse instances per thread only
+    translators = getattr(_local, "translators", None)
+    if translators is None:
+        translators = _local.translators = {}
+    key = (source, target)
+    if key not in translators:
+        translators[key] = GoogleTranslator(source=source, target=target)
+    return translators[key]
+
+@lru_cache(maxsize=TRANSLATION_CACHE_SIZE)
+def translate_cached(text, source, target):
+    return _translator(source, target).translate(text)
+
+def split_batches(text, max_chars=TRANSLATION_BATCH_CHARS):
+    """Split text at sentence and line breaks into (batch, separator) pairs of about max_chars each."""
+    pieces, pos = [], 0
+    for match in SENTENCE_END_RE.finditer(text):
+        pieces.append((text[pos:match.start()], match.group()))
+        pos = match.end()
+    pieces.append((text[pos:], ""))
+    batches, current = [], []
+    for piece in pieces:
+        if current and sum(len(s) + len(sep) for s, sep in current) + len(piece[0]) > max_chars:
+            batches.append(current)
+            current = []
+        current.append(piece)
+    batches.append(current)
+    return [("".join(s + sep for s, sep in batch[:-1]) + batch[-1][0], batch[-1][1]) for batch in batches]
+
+def translate(text, source, target):
+    if len(text) <= TRANSLATION_BATCH_CHARS:
+        return translate_cached(text, source, target)
+    batches = split_batches(text)
+    translated = _pool.map(lambda batch: translate_cached(batch[0], source, target) if batch[0].strip() else batch[0], batches)
+    return "".join((part or "") + sep for part, (_, sep) in zip(translated, batches))
 
 def detect_and_translate(text,tar):
-    # Detect language
-    detected_lang = detect(text)
-    print(f"Detected Language: {detected_lang}")
-    
-    # Translate to English
-    translated_text = GoogleTranslator(source=detected_lang,target=tar).translate(text)
-    print(f"Translated Text: {translated_text}")
-    
+    started = time.perf_counter()
+    # Detect language; text with no letters to go on (numbers, emoji) is left as it is
+    detected_lang = detect_language(text) or tar
+    logger.info(f"Detected Language: {detected_lang}")
+
+    if detected_lang == tar:
+        translated_text = text
+        with _stats_lock:
+            _stats["skipped"] += 1
+    else:
+        translated_text = translate(text, detected_lang, tar)
+        logger.debug(f"Translated Text: {translated_text}")
+
+    elapsed = time.perf_counter() - started
+    with _stats_lock:
+        _stats["calls"] += 1
+        _stats["seconds"] += elapsed
+        _stats["last_ms"] = elapsed * 1000
+    logger.info(f"Translation {detected_lang}->{tar} of {len(text)} chars took {elapsed * 1000:.0f} ms")
     return translated_text, detected_lang
 
+async def adetect_and_translate(text,tar):
+    # deep_translator has no async client, so run the network round-trip in a worker thread
+    return await asyncio.to_thread(detect_and_translate, text, tar)
 
+def translation_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    cache = translate_cached.cache_info()
+    stats["mean_ms"] = stats.pop("seconds") / stats["calls"] * 1000 if stats["calls"] else 0.0
+    stats["cache_hits"] = cache.hits
+    stats["cache_misses"] = cache.misses
+    stats["cache_entries"] = cache.currsize
+    return stats
@@ -0,0 +1,168 @@
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import logging
+from typing import Optional
+from langchain.agents import tool
+
+logger = logging.getLogger(__name__)
+
+WEB_SEARCH_BACKEND = os.getenv("WEB_SEARCH_BACKEND", "tavily")  # "tavily" or "stub" for offline runs
+WEB_SEARCH_MAX_RESULTS = int(os.getenv("WEB_SEARCH_MAX_RESULTS", "3"))
+WEB_SEARCH_CACHE_PATH = os.getenv("WEB_SEARCH_CACHE_PATH", "web_search_cache.db")
+WEB_SEARCH_CACHE_TTL_SECONDS = int(os.getenv("WEB_SEARCH_CACHE_TTL_SECONDS", str(6 * 3600)))
+WEB_SEARCH_STUB_LATENCY_SECONDS = float(os.getenv("WEB_SEARCH_STUB_LATENCY_SECONDS", "0.5"))
+
+# Same name as TavilySearchResults so prompts and traces keep referring to one tool
+TOOL_NAME = "tavily_search_results_json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS searches (
+    key TEXT PRIMARY KEY,
+    query TEXT NOT NULL,
+    results TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+def normalize_query(query: str) -> str:
+    """Lowercase and drop punctuation so trivially different phrasings share a cache entry."""
+    return " ".join(re.findall(r"[\w.%]+", query.lower())).strip(" .")
+
+class StubSearch:
+    """Deterministic offline stand-in for Tavily with a fixed latency."""
+
+    def __init__(self, latency_seconds: float = WEB_SEARCH_STUB_LATENCY_SECONDS):
+        self.latency_seconds = latency_seconds
+        self.calls = 0
+
+    async def ainvoke(self, args: dict) -> list[dict]:
+        self.calls += 1
+        await asyncio.sleep(self.latency_seconds)
+        query = args["query"]
+        return [{
+            "title": f"Stub result for {query}",
+            "url": f"https://example.com/search?q={normalize_query(query).replace(' ', '+')}",
+            "content": f"Offline stub content for the query: {query}",
+            "score": 1.0,
+        }]
+
+def make_backend(name: str = WEB_SEARCH_BACKEND, max_results: int = WEB_SEARCH_MAX_RESULTS):
+    if name == "stub":
+        return StubSearch()
+    from langchain_community.tools.tavily_search import TavilySearchResults
+    return TavilySearchResults(max_results=max_results, search_depth="basic")
+
+def _retrieve_exception(task: asyncio.Task):
+    # Mark a failed search's exception retrieved even when every caller was cancelled
+    if not task.cancelled():
+        task.exception()
+
+class CachedWebSearch:
+    """Web search results cached in SQLite for a TTL, with concurrent identical queries coalesced.
+
+    The first request for a normalized query calls the backend; requests for the
+    same query that arrive while it is in flight await the same task instead
+    of sending their own. Only successful (list) results are cached, so errors
+    are retried on the next call.
+    """
+
+    def __init__(self, backend, path: str = WEB_SEARCH_CACHE_PATH,
+                 ttl_seconds: int = WEB_SEARCH_CACHE_TTL_SECONDS, max_results: int = WEB_SEARCH_MAX_RESULTS):
+        self.backend = backend
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_results = max_results
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._in_flight: dict[str, asyncio.Task] = {}
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _key(self, query: str) -> str:
+        return hashlib.sha256(f"{self.max_results}\0{normalize_query(query)}".encode("utf-8")).hexdigest()
+
+    def _get(self, key: str) -> Optional[list]:
+        row = self._connect().execute(
+            "SELECT results FROM searches WHERE key = ? AND created_at >= ?",
+            (key, time.time() - self.ttl_seconds),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _put(self, key: str, query: str, results: list):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO searches (key, query, results, created_at) VALUES (?, ?, ?, ?)",
+                (key, query, json.dumps(results), time.time()),
+            )
+
+    def purge_expired(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM searches WHERE created_at < ?", (time.time() - self.ttl_seconds,)).rowcount
+
+    async def search(self, query: str):
+        key = self._key(query)
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(in_flight)
+        cached = await asyncio.to_thread(self._get, key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        # Re-check: another request may have started the same search while we read the cache
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(in_flight)
+        self.misses += 1
+        # The search runs in its own task that every caller awaits through a shield: if the
+        # request that started it is cancelled (e.g. a tool timeout), the others still get
+        # the result, and it is cached for the next one
+        task = asyncio.create_task(self._fetch(key, query))
+        task.add_done_callback(_retrieve_exception)
+        self._in_flight[key] = task
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key: str, query: str):
+        try:
+            results = await self.backend.ainvoke({"query": query})
+            if isinstance(results, list):
+                await asyncio.to_thread(self._put, key, query, results)
+            else:
+                logger.warning(f"Web search for {query!r} returned an error; not caching: {results}")
+            return results
+        finally:
+            del self._in_flight[key]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": (self.hits + self.coalesced) / total if total else 0.0,
+        }
+
+web_search = CachedWebSearch(make_backend())
+
+@tool(TOOL_NAME)
+async def web_search_tool(query: str):
+    """A search engine optimized for comprehensive, accurate, and trusted results. Useful for when you need to answer questions about current events. Input should be a search query."""
+    return await web_search.search(query)
@@ -1,18 +1,46 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
 from fastapi.responses import FileResponse
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Dict, Optional, List
 import os
 import asyncio
 import tempfile
 import shutil
 from TTS import text_to_speech_sarvam
+from tts_cache import AudioCache
 from STT import transcribe_audio
 from Text_analytics import analyze
-from Transliteration import transliterate
+from Transliteration import transliterate, transliterate_response
+from sarvam_client import sarvam_client
+from backend.telemetry import configure_logging, instrument, span
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled keep-alive client for all Sarvam calls, closed on shutdown
+    await sarvam_client.start()
+    yield
+    await sarvam_client.aclose()
+    shutil.rmtree(STT_TEMP_DIR, ignore_errors=True)
+
+app = FastAPI(lifespan=lifespan)
+# Request IDs, per-stage spans (including every Sarvam call) and GET /metrics
+configure_logging()
+instrument(app)
+
+# Synthesized audio, named by a hash of the text and voice settings and served by /audio/{filename}
+TTS_OUTPUT_DIR = os.getenv("TTS_OUTPUT_DIR", "tts_output")
+tts_cache = AudioCache(TTS_OUTPUT_DIR)
+
+# STT uploads stay in memory up to this size; larger ones spill into a temp dir only this process can read
+STT_SPOOL_MAX_BYTES = int(os.getenv("STT_SPOOL_MAX_BYTES", str(10 * 1024 * 1024)))
+STT_TEMP_DIR = tempfile.mkdtemp(prefix="stt_uploads_")
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+# Sarvam calls in flight at once for one batch request, and the largest batch accepted
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
 
 class TextInput(BaseModel):
     text: str
@@ -27,6 +55,12 @@ class TextAnalyticsInput(BaseModel):
     context: str
     question: str
 
+class TransliterationBatchInput(BaseModel):
+    items: List[TransliterationInput] = Field(..., max_length=BATCH_MAX_ITEMS)
+
+class TextAnalyticsBatchInput(BaseModel):
+    items: List[TextAnalyticsInput] = Field(..., max_length=BATCH_MAX_ITEMS)
+
 class TTSInput(BaseModel):
     text: str
     target_language_code: str = "en-IN"
@@ -40,23 +74,30 @@ class TTSInput(BaseModel):
 async def text_to_speech(input: TTSInput):
     """Convert text to speech using Sarvam AI's TTS API."""
     try:
-        # Call the TTS function
-        text_to_speech_sarvam(
-            text=input.text,
-            target_language_code=input.target_language_code,
-            speaker=input.speaker,
-            model=input.model,
-            pitch=input.pitch,
-            pace=input.pace,
-            loudness=input.loudness
+        filename = AudioCache.key(
+            input.text, input.target_language_code, input.speaker, input.model,
+            input.pitch, input.pace, input.loudness
         )
-        
-        # Return the path to the first output file
-        # Note: This assumes the TTS function creates files named output0.wav, output1.wav, etc.
-        if os.path.exists("output0.wav"):
-            return {"status": "success", "message": "Audio generated successfully", "files": ["output0.wav"]}
-        else:
-            return {"status": "error", "message": "Failed to generate audio files"}
+        # Repeated text with the same voice settings is a file lookup, not an API call
+        with span("tts_cache") as record:
+            record["hit"] = tts_cache.lookup(filename) is not None
+        if record["hit"]:
+            return {"status": "success", "message": "Audio served from cache", "files": [filename], "cached": True}
+
+        # Chunks are synthesized concurrently over the shared client
+        with span("tts_synthesize", chars=len(input.text)):
+            audio = await text_to_speech_sarvam(
+                text=input.text,
+                target_language_code=input.target_language_code,
+                speaker=input.speaker,
+                model=input.model,
+                pitch=input.pitch,
+                pace=input.pace,
+                loudness=input.loudness
+            )
+        with span("tts_store"):
+            await asyncio.to_thread(tts_cache.store, filename, audio)
+        return {"status": "success", "message": "Audio generated successfully", "files": [filename], "cached": False}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"TTS processing error: {str(e)}")
 
@@ -64,29 +105,29 @@ async def text_to_speech(input: TTSInput):
 async def speech_to_text(file: UploadFile = File(...), language_code: str = "en-IN"):
     """Convert speech to text using Sarvam AI's STT API."""
     try:
-        # Save the uploaded file temporarily
-        temp_file_path = f"temp_{file.filename}"
-        with open(temp_file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Process the audio file
-        transcription = await transcribe_audio(temp_file_path, language_code)
-        
-        # Clean up the temporary file
-        os.remove(temp_file_path)
-        
+        # Stream the upload into memory; only large uploads spill to a file in a private temp dir
+        with tempfile.SpooledTemporaryFile(max_size=STT_SPOOL_MAX_BYTES, dir=STT_TEMP_DIR) as buffer:
+            with span("stt_upload") as record:
+                while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                    buffer.write(chunk)
+                record["bytes"] = buffer.tell()
+                buffer.seek(0)
+
+            # Process the audio file
+            with span("stt_transcribe"):
+                transcription = await transcribe_audio(
+                    buffer, language_code, os.path.basename(file.filename or "audio.wav"), file.content_type
+                )
+
         return {"status": "success", "transcription": transcription}
     except Exception as e:
-        # Clean up in case of error
-        if os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
         raise HTTPException(status_code=500, detail=f"STT processing error: {str(e)}")
 
 @app.post("/transliterate/")
 async def transliterate_text(input: TransliterationInput):
     """Transliterate text from one script to another using Sarvam AI's Transliteration API."""
     try:
-        result = transliterate(
+        result = await transliterate(
             input_text=input.text,
             source_language_code=input.source_language_code,
             target_language_code=input.target_language_code
@@ -99,19 +140,78 @@ async def transliterate_text(input: TransliterationInput):
 async def text_analytics(input: TextAnalyticsInput):
     """Perform text analytics using Sarvam AI's Text Analytics API."""
     try:
-        result = analyze(context=input.context, question=input.question)
+        result = await analyze(context=input.context, question=input.question)
         return {"status": "success", "result": result.json() if hasattr(result, 'json') else result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Text analytics error: {str(e)}")
 
+async def run_batch(items, key, call):
+    """Call once per distinct input, BATCH_CONCURRENCY at a time; one result per item, in input order.
+
+    A failing item gets an error entry instead of failing the whole batch.
+    """
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    unique = {}
+    for item in items:
+        unique.setdefault(key(item), item)
+
+    async def run_one(item):
+        async with semaphore:
+            try:
+                return {"status": "success", "result": await call(item)}
+            except Exception as e:
+                return {"status": "error", "error": str(e)}
+
+    with span("batch", items=len(items), unique=len(unique)):
+        outcomes = dict(zip(unique, await asyncio.gather(*(run_one(item) for item in unique.values()))))
+    return [outcomes[key(item)] for item in items]
+
+@app.post("/transliterate/batch")
+async def transliterate_batch(input: TransliterationBatchInput):
+    """Transliterate many texts in one request; identical items are sent to the API once."""
+    async def call(item):
+        response = await transliterate_response(
+            input_text=item.text,
+            source_language_code=item.source_language_code,
+            target_language_code=item.target_language_code
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"Sarvam transliteration returned {response.status_code}: {response.text}")
+        return response.json()
+    results = await run_batch(
+        input.items,
+        lambda item: (item.text, item.source_language_code, item.target_language_code),
+        call,
+    )
+    return {"status": "success", "results": results}
+
+@app.post("/text_analytics/batch")
+async def text_analytics_batch(input: TextAnalyticsBatchInput):
+    """Run text analytics on many (context, question) pairs; identical pairs are sent to the API once."""
+    async def call(item):
+        response = await analyze(context=item.context, question=item.question)
+        if response.status_code != 200:
+            raise RuntimeError(f"Sarvam text analytics returned {response.status_code}: {response.text}")
+        return response.json()
+    results = await run_batch(input.items, lambda item: (item.context, item.question), call)
+    return {"status": "success", "results": results}
+
 @app.get("/")
 def home():
     return {"message": "Welcome to the Sarvam AI Tool Calling Service!"}
 
+@app.get("/health")
+async def health():
+    return {"status": "ok", "tts_cache": tts_cache.stats()}
+
 # Endpoint to get generated audio files
 @app.get("/audio/{filename}")
 async def get_audio(filename: str):
     """Get a generated audio file."""
-    if os.path.exists(filename):
-        return FileResponse(filename)
+    # Only plain file names inside the cache directory; no paths
+    if os.path.basename(filename) != filename or not filename.endswith(".wav"):
+        raise HTTPException(status_code=404, detail="Audio file not found")
+    path = tts_cache.open_path(filename)
+    if path is not None:
+        return FileResponse(path, media_type="audio/wav")
     raise HTTPException(status_code=404, detail="Audio file not found")
@@ -0,0 +1,117 @@
+"""Concurrent-request throughput of backend/main.py's /ask endpoint.
+
+Runs the real FastAPI app in-process with the agent and the translator
+replaced by stand-ins that take a fixed amount of time, once with stand-ins
+that block the event loop (what the synchronous ``react_agent.invoke`` and
+``GoogleTranslator`` calls used to do) and once with awaitable ones (the async
+pipeline). No API keys or network access are needed.
+
+    python benchmarks/ask_concurrency.py --requests 50 --concurrency 25
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+from langchain_core.messages import AIMessage
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+# The model and Tavily clients are constructed at import time but never called here
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ.setdefault("TAVILY_API_KEY", "tvly-benchmark")
+BENCH_DIR = tempfile.mkdtemp(prefix="ask_bench_")
+os.environ["CONV_DB_PATH"] = os.path.join(BENCH_DIR, "conversations.db")
+os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(BENCH_DIR, "embedding_cache.db")
+# Importing main opens the web-search cache; keep it in the temp dir and off the Tavily API
+os.environ["WEB_SEARCH_CACHE_PATH"] = os.path.join(BENCH_DIR, "web_search_cache.db")
+os.environ["WEB_SEARCH_BACKEND"] = "stub"
+# Every request must reach the agent; the answer cache would otherwise serve repeats
+os.environ["ANSWER_CACHE_ENABLED"] = "false"
+
+import main  # noqa: E402
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+class StubAgent:
+    def __init__(self, latency: float, blocking: bool):
+        self.latency = latency
+        self.blocking = blocking
+
+    async def ainvoke(self, state, config=None):
+        if self.blocking:
+            time.sleep(self.latency)
+        else:
+            await asyncio.sleep(self.latency)
+        return {"messages": state["messages"] + [AIMessage(content="Stub answer about loans.")]}
+
+
+def stub_translator(latency: float, blocking: bool):
+    async def translate(text, tar):
+        if blocking:
+            time.sleep(latency)
+        else:
+            await asyncio.sleep(latency)
+        return text, "en"
+    return translate
+
+
+async def run(mode: str, total: int, concurrency: int, agent_latency: float, translate_latency: float) -> dict:
+    blocking = mode == "blocking"
+    main.react_agent = StubAgent(agent_latency, blocking)
+    main.adetect_and_translate = stub_translator(translate_latency, blocking)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def one(i):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/ask", json={"question": f"What is the home loan rate? #{i}"})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "requests": total,
+        "seconds": elapsed,
+        "req_per_sec": total / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+async def run_all(args) -> list:
+    results = []
+    for mode in ("blocking", "async"):
+        results.append(await run(mode, args.requests, args.concurrency, args.agent_latency, args.translate_latency))
+    return results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=25)
+    parser.add_argument("--agent-latency", type=float, default=0.3, help="seconds per agent call")
+    parser.add_argument("--translate-latency", type=float, default=0.05, help="seconds per translation")
+    args = parser.parse_args()
+
+    print(f"{'mode':<10} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'total s':>8}")
+    for r in asyncio.run(run_all(args)):
+        print(f"{r['mode']:<10} {r['req_per_sec']:>8.1f} {r['p50_ms']:>8.0f} {r['p95_ms']:>8.0f} {r['seconds']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,172 @@
+"""Deterministic, offline stand-ins for OpenAI, Tavily and Sarvam AI.
+
+``offline_environment`` must run before the backend modules are imported,
+because they read their configuration (database paths, search backend, ...)
+at import time.
+"""
+import asyncio
+import hashlib
+import math
+import os
+import re
+import sys
+import time
+from typing import Any, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(ROOT_DIR, "backend")
+# backend/ first: both directories have a translate_text.py and the app needs backend's
+for path in (ROOT_DIR, BACKEND_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+WORD_RE = re.compile(r"\w+")
+
+
+def offline_environment(workdir: str, persist_directory: Optional[str] = None):
+    """Point every cache, database and remote service at ``workdir`` and local stubs."""
+    os.makedirs(workdir, exist_ok=True)
+    os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+    os.environ.setdefault("TAVILY_API_KEY", "tvly-offline")
+    os.environ.setdefault("SARVAM_API_KEY", "sarvam-offline")
+    os.environ["CONV_DB_PATH"] = os.path.join(workdir, "conversations.db")
+    os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(workdir, "embedding_cache.db")
+    os.environ["WEB_SEARCH_CACHE_PATH"] = os.path.join(workdir, "web_search_cache.db")
+    os.environ["WEB_SEARCH_BACKEND"] = "stub"
+    os.environ["TTS_OUTPUT_DIR"] = os.path.join(workdir, "tts_output")
+    os.environ["RAG_PERSIST_DIRECTORY"] = persist_directory or os.path.join(workdir, "embeddings_db")
+    # Every benchmarked request should do the full work
+    os.environ["ANSWER_CACHE_ENABLED"] = "false"
+
+
+class HashEmbeddings(Embeddings):
+    """Bag-of-words vectors from hashed tokens: similar texts get similar vectors, no API needed.
+
+    ``latency`` seconds are spent per call to stand in for the network round-trip.
+    """
+
+    def __init__(self, dimensions: int = 256, latency: float = 0.0):
+        self.dimensions = dimensions
+        self.latency = latency
+        self.calls = 0
+
+    def _vector(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for word in WORD_RE.findall(text.lower()):
+            digest = hashlib.md5(word.encode("utf-8")).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimensions
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def cached_fake_embeddings(path: str, latency: float = 0.0):
+    """HashEmbeddings behind the real on-disk embedding cache."""
+    from embedding_cache import CachedEmbeddings
+    return CachedEmbeddings(HashEmbeddings(latency=latency), model="fake-hash", dimensions=256, path=path)
+
+
+def approximate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Chat model that follows a fixed script instead of calling an LLM.
+
+    With tools bound (the ReAct agent) it answers a new question by calling
+    ``tool_name`` with it, then answers from the tool's output. Without tools
+    (the chain inside retriever_tool) it answers from the prompt. Responses
+    carry usage metadata, and ``latency`` seconds stand in for the model.
+    """
+
+    latency: float = 0.0
+    tool_name: str = "retriever_tool"
+    tools_bound: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "ScriptedChatModel":
+        return self.model_copy(update={"tools_bound": True})
+
+    def _respond(self, messages: List[BaseMessage]) -> AIMessage:
+        last = messages[-1]
+        if self.tools_bound and isinstance(last, HumanMessage):
+            content = ""
+            tool_calls = [{
+                "name": self.tool_name,
+                "args": {"question": str(last.content)},
+                "id": "call_" + hashlib.sha1(str(last.content).encode("utf-8")).hexdigest()[:12],
+            }]
+        elif isinstance(last, ToolMessage):
+            content, tool_calls = f"According to the bank documents: {str(last.content)[:300]}", []
+        else:
+            prompt = "\n".join(str(message.content) for message in messages)
+            content, tool_calls = f"Scripted answer drawn from {len(prompt)} characters of context.", []
+        prompt_tokens = sum(approximate_tokens(str(message.content)) for message in messages)
+        output_tokens = approximate_tokens(content) + 10 * len(tool_calls)
+        return AIMessage(
+            content=content,
+            tool_calls=tool_calls,
+            usage_metadata={"input_tokens": prompt_tokens, "output_tokens": output_tokens,
+                            "total_tokens": prompt_tokens + output_tokens},
+        )
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+
+class EchoTranslator:
+    """Drop-in for deep_translator's GoogleTranslator that returns the text unchanged."""
+
+    latency = 0.0
+
+    def __init__(self, source: str = "auto", target: str = "en"):
+        self.source = source
+        self.target = target
+
+    def translate(self, text: str) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        return text
+
+
+def use_echo_translator(latency: float = 0.0):
+    """Make translate_text.py translate with EchoTranslator instead of Google Translate."""
+    import translate_text
+    EchoTranslator.latency = latency
+    translate_text.GoogleTranslator = EchoTranslator
+    translate_text.translate_cached.cache_clear()
+
+
+def use_mock_sarvam():
+    """Route the shared Sarvam client to mock_sarvam_server.py in-process."""
+    import httpx
+    import mock_sarvam_server
+    from sarvam_client import sarvam_client
+    sarvam_client._client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=mock_sarvam_server.app), base_url="http://mock-sarvam"
+    )
+    return mock_sarvam_server
@@ -0,0 +1,90 @@
+"""Speed and accuracy of the Unicode-script language detector against langdetect.
+
+Classifies a fixed set of short, labelled user queries in Indic scripts and in
+English with backend/script_detect.py and with plain ``langdetect.detect``.
+Runs offline.
+
+    python benchmarks/language_detection.py --repeats 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+from langdetect import detect  # noqa: E402
+from langdetect.lang_detect_exception import LangDetectException  # noqa: E402
+
+from script_detect import detect_language  # noqa: E402
+
+# (query, expected language code)
+QUERIES = [
+    ("होम लोन की ब्याज दर क्या है?", "hi"),
+    ("HDFC एजुकेशन लोन के लिए कौन पात्र है?", "hi"),
+    ("SBI कार लोन प्रोसेसिंग फीस", "hi"),
+    ("வீட்டுக் கடன் வட்டி விகிதம் என்ன?", "ta"),
+    ("IOB தங்க கடன் பற்றி சொல்லுங்கள்", "ta"),
+    ("గృహ రుణం వడ్డీ రేటు ఎంత?", "te"),
+    ("ವಿದ್ಯಾಭ್ಯಾಸ ಸಾಲಕ್ಕೆ ಯಾರು ಅರ್ಹರು?", "kn"),
+    ("গৃহঋণের সুদের হার কত?", "bn"),
+    ("ഭവന വായ്പയുടെ പലിശ നിരക്ക് എത്രയാണ്?", "ml"),
+    ("હોમ લોનનો વ્યાજ દર શું છે?", "gu"),
+    ("ਘਰ ਕਰਜ਼ੇ ਦੀ ਵਿਆਜ ਦਰ ਕੀ ਹੈ?", "pa"),
+    ("What is the interest rate on HDFC home loans?", "en"),
+    ("Who is eligible for the SBI Pension Loan?", "en"),
+    ("Tell me about the IOB clean loan", "en"),
+    ("Compare gold loan rates between SBI and HDFC", "en"),
+    ("How much processing fee does SBI charge for a car loan?", "en"),
+]
+
+
+def langdetect_only(text):
+    try:
+        return detect(text)
+    except LangDetectException:
+        return None
+
+
+def evaluate(name, detector, repeats):
+    correct, latencies = 0, {"indic": [], "latin": []}
+    for query, expected in QUERIES:
+        group = "latin" if expected == "en" else "indic"
+        for _ in range(repeats):
+            started = time.perf_counter()
+            detected = detector(query)
+            latencies[group].append(time.perf_counter() - started)
+        correct += detected == expected
+    return {
+        "detector": name,
+        "accuracy": correct / len(QUERIES),
+        "indic_us": statistics.mean(latencies["indic"]) * 1e6,
+        "latin_us": statistics.mean(latencies["latin"]) * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=200, help="timed runs per query")
+    args = parser.parse_args()
+
+    # Load langdetect's profiles up front so neither detector is timed on that one-off cost
+    first_started = time.perf_counter()
+    detect_language(QUERIES[0][0])
+    langdetect_only(QUERIES[0][0])
+    print(f"langdetect profile load: {(time.perf_counter() - first_started) * 1000:.0f} ms")
+
+    results = [
+        evaluate("langdetect", langdetect_only, args.repeats),
+        evaluate("script", detect_language, args.repeats),
+    ]
+
+    print(f"{'detector':<12} {'accuracy':>8} {'indic us':>10} {'latin us':>10}")
+    for r in results:
+        print(f"{r['detector']:<12} {r['accuracy']:>8.2f} {r['indic_us']:>10.1f} {r['latin_us']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
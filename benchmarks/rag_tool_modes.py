@@ -0,0 +1,97 @@
+"""Latency and token use of retriever_tool's two modes, offline.
+
+``answer`` (the default) runs the ConversationalRetrievalChain and its own LLM
+call inside the tool; ``chunks`` returns the top excerpts and lets the agent
+answer in one pass. Each labelled question from retrieval_hybrid.py goes
+through a ReAct agent in both modes, with the scripted chat model from
+fakes.py spending ``--llm-latency`` seconds per call, and token usage is
+counted with the same callback /ask uses. Tokens are estimated from text
+length, so compare the modes with each other rather than with real bills.
+
+    python benchmarks/rag_tool_modes.py --llm-latency 0.8
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import fakes
+
+
+async def run_mode(mode: str, questions: list, llm_latency: float, repeats: int) -> dict:
+    from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
+    from langgraph.prebuilt import create_react_agent
+    import rag
+    from context_window import count_tokens
+    from prompts import react_prompt, react_prompt_chunks
+    from token_usage import UsageCallbackHandler
+
+    rag.RAG_TOOL_MODE = mode
+    prompt = react_prompt_chunks if mode == "chunks" else react_prompt
+    agent = create_react_agent(model=fakes.ScriptedChatModel(latency=llm_latency), tools=[rag.retriever_tool])
+    latencies, calls, input_tokens, output_tokens, tool_tokens = [], [], [], [], []
+    for _ in range(repeats):
+        for question in questions:
+            usage = UsageCallbackHandler()
+            started = time.perf_counter()
+            result = await agent.ainvoke(
+                {"messages": [SystemMessage(content=prompt), HumanMessage(content=question)]},
+                config={"callbacks": [usage]},
+            )
+            latencies.append(time.perf_counter() - started)
+            calls.append(usage.usage["llm_calls"])
+            input_tokens.append(usage.usage["input_tokens"])
+            output_tokens.append(usage.usage["output_tokens"])
+            tool_tokens.append(sum(count_tokens(str(m.content)) for m in result["messages"] if isinstance(m, ToolMessage)))
+    latencies.sort()
+    return {
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p95_ms": latencies[max(0, int(len(latencies) * 0.95) - 1)] * 1000,
+        "llm_calls": statistics.mean(calls),
+        "input_tokens": statistics.mean(input_tokens),
+        "output_tokens": statistics.mean(output_tokens),
+        "tool_output_tokens": statistics.mean(tool_tokens),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="seconds per fake chat model call")
+    parser.add_argument("--repeats", type=int, default=1)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="rag_tool_modes_")
+    persist_directory = os.path.join(workdir, "embeddings_db")
+    fakes.offline_environment(workdir, persist_directory)
+    logging.basicConfig(level=logging.WARNING, force=True)
+
+    import run_benchmarks
+    from retrieval_hybrid import QUESTIONS
+
+    print("Building an index with fake embeddings...", file=sys.stderr)
+    run_benchmarks.bench_ingestion({"workdir": workdir, "persist_directory": persist_directory, "embed_latency": 0.0})
+
+    import rag
+    rag.cached_openai_embeddings = lambda **kwargs: fakes.cached_fake_embeddings(
+        os.path.join(workdir, "query_embedding_cache.db"))
+    rag.ChatOpenAI = lambda **kwargs: fakes.ScriptedChatModel(latency=args.llm_latency)
+    rag.retrieval_engine.start()
+
+    questions = [question for question, _ in QUESTIONS]
+    results = {mode: asyncio.run(run_mode(mode, questions, args.llm_latency, args.repeats))
+               for mode in ("answer", "chunks")}
+
+    print(f"{len(questions)} questions x {args.repeats}, {args.llm_latency:.2f}s per LLM call, "
+          f"chunk budget {rag.RAG_CHUNK_TOKEN_BUDGET} tokens")
+    print(f"{'mode':<8} {'mean ms':>9} {'p95 ms':>9} {'LLM calls':>10} {'input tok':>10} {'output tok':>11} {'tool tok':>9}")
+    for mode, r in results.items():
+        print(f"{mode:<8} {r['mean_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['llm_calls']:>10.2f} "
+              f"{r['input_tokens']:>10.0f} {r['output_tokens']:>11.0f} {r['tool_output_tokens']:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Hit rate and latency of hybrid (BM25 + vector) retrieval against vector-only.
+
+Uses the index built by process_bank_docs.py (embeddings_db/ and its
+bm25_index.json). Query embeddings go through the on-disk embedding cache, so
+only the first run needs to call the embeddings API.
+
+    python benchmarks/retrieval_hybrid.py --k 3
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "backend"))
+
+from langchain_community.vectorstores import Chroma  # noqa: E402
+
+from bm25_index import BM25_INDEX_FILE, BM25Index  # noqa: E402
+from embedding_cache import cached_openai_embeddings  # noqa: E402
+from rag import HybridRetriever  # noqa: E402
+
+# (question, substrings of the source paths that answer it)
+QUESTIONS = [
+    ("What is CBLR for HDFC Credila education loans?", ["HDFC Education Loans"]),
+    ("Tell me about the HDFC Smartdraft overdraft against salary", ["HDFC Smartdraft"]),
+    ("What is the SBI Xpress Credit personal loan?", ["SBI Loan Schemes", "Report on State Bank of India"]),
+    ("Who is eligible for the SBI Pension Loan?", ["SBI Loan Schemes", "Report on State Bank of India"]),
+    ("SBI Shaurya home loan for defence personnel", ["SBI Home Loan Products", "SBI Government Sponsored"]),
+    ("Features of the IOB clean loan", ["clean_loan.md"]),
+    ("IOB loans for self help groups (SHG)", ["shg_loans.md"]),
+    ("What is the IOB MSME Insta fund?", ["msme_insta_fund.md"]),
+    ("Kisan credit card loan at Indian Overseas Bank", ["kcc_loan.md"]),
+    ("SBI Surya Shakti solar finance scheme", ["SBI Business Loans"]),
+    ("HDFC gold loan interest rate", ["HDFC Gold Loan"]),
+    ("SBI car loan processing fee", ["SBI Car Loan"]),
+    ("HDFC two wheeler loan tenure", ["HDFC Bank Two Wheeler", "HDFC Bank Two-Wheeler"]),
+    ("IOB vehicle loan margin", ["vehicle_loan.md"]),
+    ("SBI construction equipment loan eligibility", ["SBI Construction Equipment"]),
+    ("HDFC loan against property rates", ["HDFC Bank Loan Against Property"]),
+]
+
+
+def evaluate(retriever: HybridRetriever, repeats: int) -> dict:
+    hits, latencies = 0, []
+    for question, expected in QUESTIONS:
+        for _ in range(repeats):
+            started = time.perf_counter()
+            docs = retriever.invoke(question)
+            latencies.append(time.perf_counter() - started)
+        sources = [doc.metadata.get("source", "") for doc in docs]
+        hits += any(substring in source for source in sources for substring in expected)
+    latencies.sort()
+    return {
+        "hit_rate": hits / len(QUESTIONS),
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--persist-directory", default=os.path.join(ROOT_DIR, "embeddings_db"))
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=5, help="timed runs per question")
+    args = parser.parse_args()
+    logging.getLogger("rag").setLevel(logging.WARNING)
+
+    vectorstore = Chroma(persist_directory=args.persist_directory, embedding_function=cached_openai_embeddings())
+    bm25 = BM25Index.load(os.path.join(args.persist_directory, BM25_INDEX_FILE))
+    if bm25 is None:
+        sys.exit("Build the index first: python process_bank_docs.py")
+
+    # Embed every question once up front so both modes are timed against warm caches
+    for question, _ in QUESTIONS:
+        vectorstore.embeddings.embed_query(question)
+
+    print(f"{'mode':<12} {'hit@' + str(args.k):>8} {'mean ms':>8} {'p95 ms':>8}")
+    for mode, index in (("vector", None), ("hybrid", bm25)):
+        r = evaluate(HybridRetriever(vectorstore=vectorstore, bm25=index, k=args.k), args.repeats)
+        print(f"{mode:<12} {r['hit_rate']:>8.2f} {r['mean_ms']:>8.1f} {r['p95_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
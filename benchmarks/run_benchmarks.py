@@ -0,0 +1,362 @@
+"""Offline component benchmarks: ingestion, retrieval, /ask stages and the Sarvam endpoints.
+
+OpenAI, Tavily and Sarvam AI are replaced by the deterministic stand-ins in
+fakes.py, so no API keys or network access are needed. Results are written
+as JSON and compared against a stored baseline; a metric that is worse than
+the baseline by more than the tolerance is reported as a regression and the
+script exits with status 1.
+
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --suites ask sarvam --tolerance 0.5
+    python benchmarks/run_benchmarks.py --update-baseline
+"""
+import argparse
+import asyncio
+import io
+import json
+import logging
+import math
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import wave
+
+import fakes
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+SUITES = ("ingestion", "retrieval", "ask", "sarvam")
+# Differences smaller than this are noise, whatever the relative change
+NOISE_FLOOR = {"ms": 1.0}
+# Timed blocks of retrieval passes; the median block is reported
+RETRIEVAL_BLOCKS = 5
+
+
+def metric(value: float, unit: str, better: str) -> dict:
+    return {"value": round(value, 3), "unit": unit, "better": better}
+
+
+def latency_metrics(prefix: str, seconds: list) -> dict:
+    seconds = sorted(seconds)
+    return {
+        f"{prefix}_mean_ms": metric(statistics.mean(seconds) * 1000, "ms", "lower"),
+        f"{prefix}_p95_ms": metric(seconds[max(0, math.ceil(len(seconds) * 0.95) - 1)] * 1000, "ms", "lower"),
+    }
+
+
+def load_corpus() -> list:
+    """The bank documents as plain text with the same metadata ingestion attaches.
+
+    Parsing with unstructured needs model downloads, so it is not part of the benchmark.
+    """
+    from langchain_core.documents import Document
+    from bank_metadata import path_metadata
+    import process_bank_docs
+
+    documents = []
+    for path in process_bank_docs.list_source_files(os.path.join(fakes.ROOT_DIR, "All Banks Files")):
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            documents.append(Document(page_content=f.read(), metadata={"source": path, **path_metadata(path)}))
+    return documents
+
+
+def bench_ingestion(ctx: dict) -> dict:
+    import process_bank_docs
+    from bm25_index import BM25_INDEX_FILE, BM25Index
+
+    embeddings = fakes.cached_fake_embeddings(os.path.join(ctx["workdir"], "ingest_embedding_cache.db"),
+                                              latency=ctx["embed_latency"])
+    process_bank_docs.get_embeddings = lambda: embeddings
+    chunks = process_bank_docs.split_documents(load_corpus())
+    ids = [process_bank_docs.chunk_id(chunk) for chunk in chunks]
+
+    started = time.perf_counter()
+    vectorstore = process_bank_docs.create_embeddings_and_store(chunks, ctx["persist_directory"], ids)
+    embed_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    BM25Index.from_vectorstore(vectorstore).save(os.path.join(ctx["persist_directory"], BM25_INDEX_FILE))
+    bm25_seconds = time.perf_counter() - started
+    ctx["ingested"] = True
+    return {
+        "ingest_chunks": metric(len(chunks), "chunks", "higher"),
+        "ingest_chunks_per_sec": metric(len(chunks) / embed_seconds, "chunks/s", "higher"),
+        "ingest_bm25_build_ms": metric(bm25_seconds * 1000, "ms", "lower"),
+    }
+
+
+def bench_retrieval(ctx: dict) -> dict:
+    from langchain_community.vectorstores import Chroma
+    from bm25_index import BM25_INDEX_FILE, BM25Index
+    from rag import HybridRetriever
+    from retrieval_hybrid import QUESTIONS
+
+    embeddings = fakes.cached_fake_embeddings(os.path.join(ctx["workdir"], "query_embedding_cache.db"))
+    vectorstore = Chroma(persist_directory=ctx["persist_directory"], embedding_function=embeddings)
+    bm25 = BM25Index.load(os.path.join(ctx["persist_directory"], BM25_INDEX_FILE))
+    retriever = HybridRetriever(vectorstore=vectorstore, bm25=bm25, k=3)
+    # First pass fills the query embedding cache and scores hits; the timed passes measure retrieval itself
+    hits = 0
+    for question, expected in QUESTIONS:
+        sources = [doc.metadata.get("source", "") for doc in retriever.invoke(question)]
+        hits += any(substring in source for source in sources for substring in expected)
+    # A query takes a few ms, so a slow stretch on a busy machine can skew a whole pass: time
+    # several blocks of passes and report the median block
+    blocks = []
+    for _ in range(RETRIEVAL_BLOCKS):
+        latencies = []
+        for _ in range(ctx["repeats"]):
+            for question, _ in QUESTIONS:
+                started = time.perf_counter()
+                retriever.invoke(question)
+                latencies.append(time.perf_counter() - started)
+        blocks.append(latency_metrics("retrieval", latencies))
+    results = {"retrieval_hit_rate": metric(hits / len(QUESTIONS), "ratio", "higher")}
+    for name in blocks[0]:
+        results[name] = metric(statistics.median(block[name]["value"] for block in blocks), "ms", "lower")
+    return results
+
+
+class StageTimer:
+    """Collects per-stage durations of /ask by wrapping the functions it awaits."""
+
+    def __init__(self):
+        self.samples = {}
+
+    def record(self, stage: str, seconds: float):
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def wrap_async(self, stage: str, func):
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - started)
+        return timed
+
+    def wrap_sync(self, stage: str, func):
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - started)
+        return timed
+
+
+class TimedRunnable:
+    """Proxy that times ``ainvoke`` of a runnable (the agent, the RAG chain) as one stage."""
+
+    def __init__(self, runnable, stage: str, timer: StageTimer):
+        self.runnable = runnable
+        self.ainvoke = timer.wrap_async(stage, runnable.ainvoke)
+
+    def __getattr__(self, name):
+        return getattr(self.runnable, name)
+
+
+async def bench_ask(ctx: dict) -> dict:
+    import httpx
+    from langchain_core.messages import HumanMessage, SystemMessage
+    from langgraph.prebuilt import create_react_agent
+    import rag
+    import main
+    from retrieval_hybrid import QUESTIONS
+    from telemetry import tracing_config
+    from token_usage import UsageCallbackHandler
+
+    rag.cached_openai_embeddings = lambda **kwargs: fakes.cached_fake_embeddings(
+        os.path.join(ctx["workdir"], "query_embedding_cache.db"))
+    rag.ChatOpenAI = lambda **kwargs: fakes.ScriptedChatModel(latency=ctx["llm_latency"])
+    fakes.use_echo_translator(ctx["translate_latency"])
+    await asyncio.to_thread(rag.retrieval_engine.start)
+
+    timer = StageTimer()
+    agent = create_react_agent(model=fakes.ScriptedChatModel(latency=ctx["llm_latency"]),
+                               tools=main.agent_tools)
+    main.react_agent = TimedRunnable(agent, "agent", timer)
+    main.adetect_and_translate = timer.wrap_async("translate", main.adetect_and_translate)
+    main.agent_messages = timer.wrap_async("history", main.agent_messages)
+    main.conversation_store.append = timer.wrap_sync("store", main.conversation_store.append)
+    main.history_summarizer.llm = fakes.ScriptedChatModel(latency=ctx["llm_latency"])
+    main.history_summarizer.refresh = timer.wrap_async("summarize", main.history_summarizer.refresh)
+    rag.retrieval_engine.chain = TimedRunnable(rag.retrieval_engine.chain, "rag_chain", timer)
+
+    totals = []
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        # One untimed pass first: the first agent runs pay for lazy imports and graph compilation,
+        # and per-request times keep falling for a few dozen requests after that
+        for question, _ in QUESTIONS:
+            response = await client.post("/ask", json={"question": question})
+            response.raise_for_status()
+        timer.samples.clear()
+        session_id = None
+        for i in range(ctx["repeats"]):
+            for question, _ in QUESTIONS:
+                started = time.perf_counter()
+                response = await client.post("/ask", json={"question": question, "session_id": session_id})
+                response.raise_for_status()
+                totals.append(time.perf_counter() - started)
+                session_id = response.headers["X-Session-ID"]
+
+    results = latency_metrics("ask_total", totals)
+    for stage, samples in timer.samples.items():
+        results[f"ask_{stage}_mean_ms"] = metric(statistics.mean(samples) * 1000, "ms", "lower")
+    # Everything /ask does besides waiting for the agent
+    overhead = statistics.mean(totals) - statistics.mean(timer.samples["agent"])
+    results["ask_overhead_mean_ms"] = metric(overhead * 1000, "ms", "lower")
+
+    # What /ask's tracing and token accounting callbacks add to one agent run: the same
+    # questions with and without them, interleaved so drift affects both alike
+    with_callbacks, without_callbacks = [], []
+    for i in range(ctx["repeats"]):
+        for question, _ in QUESTIONS:
+            state = {"messages": [SystemMessage(content=main.agent_prompt), HumanMessage(content=question)]}
+            for config, samples in ((tracing_config(UsageCallbackHandler()), with_callbacks), ({}, without_callbacks)):
+                started = time.perf_counter()
+                await agent.ainvoke(state, config=config)
+                samples.append(time.perf_counter() - started)
+    callbacks = statistics.mean(with_callbacks) - statistics.mean(without_callbacks)
+    results["ask_callbacks_overhead_mean_ms"] = metric(callbacks * 1000, "ms", "lower")
+    return results
+
+
+def speech_wav(seconds: float, rate: int = 16000) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(rate)
+        wav_file.writeframes(b"\0\0" * int(seconds * rate))
+    return buffer.getvalue()
+
+
+async def bench_sarvam(ctx: dict) -> dict:
+    import httpx
+    fakes.use_mock_sarvam()
+    import backend_interface
+
+    answer = ("The HDFC gold loan is available at competitive interest rates. "
+              "Processing fees are charged as a percentage of the loan amount. ") * 12
+    timings = {"tts_cold": [], "tts_cached": [], "stt_60s": [], "transliterate_batch_20": []}
+    transport = httpx.ASGITransport(app=backend_interface.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def timed(name, request):
+            started = time.perf_counter()
+            response = await request
+            response.raise_for_status()
+            timings[name].append(time.perf_counter() - started)
+
+        audio = speech_wav(60)
+        items = [{"text": f"loan {i % 10}", "source_language_code": "en-IN", "target_language_code": "hi-IN"}
+                 for i in range(20)]
+        for i in range(ctx["repeats"]):
+            text = f"{answer} Request {i}."
+            await timed("tts_cold", client.post("/tts/", json={"text": text}))
+            await timed("tts_cached", client.post("/tts/", json={"text": text}))
+            await timed("stt_60s", client.post("/stt/", files={"file": ("speech.wav", audio, "audio/wav")}))
+            await timed("transliterate_batch_20", client.post("/transliterate/batch", json={"items": items}))
+
+    results = {}
+    for name, samples in timings.items():
+        results[f"{name}_mean_ms"] = metric(statistics.mean(samples) * 1000, "ms", "lower")
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """(name, baseline value, value, change, regressed) for metrics present in both."""
+    rows = []
+    for name, current in results.items():
+        reference = baseline.get(name)
+        if reference is None or not reference["value"]:
+            continue
+        change = (current["value"] - reference["value"]) / reference["value"]
+        worse = change > tolerance if current["better"] == "lower" else change < -tolerance
+        noise = NOISE_FLOOR.get(current["unit"], 0.0)
+        regressed = worse and abs(current["value"] - reference["value"]) > noise
+        rows.append((name, reference["value"], current["value"], change, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--suites", nargs="+", choices=SUITES, default=list(SUITES))
+    parser.add_argument("--output", default=os.path.join(BENCH_DIR, "results.json"))
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="seconds per fake embeddings call")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds per fake chat model call")
+    parser.add_argument("--translate-latency", type=float, default=0.0, help="seconds per fake translation")
+    parser.add_argument("--sarvam-latency", type=float, default=0.05, help="seconds per mock Sarvam call")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="benchmarks_")
+    persist_directory = os.path.join(workdir, "embeddings_db")
+    fakes.offline_environment(workdir, persist_directory)
+    os.environ["MOCK_SARVAM_LATENCY_SECONDS"] = str(args.sarvam_latency)
+    logging.basicConfig(level=logging.WARNING, force=True)
+
+    ctx = {
+        "workdir": workdir,
+        "persist_directory": persist_directory,
+        "repeats": args.repeats,
+        "embed_latency": args.embed_latency,
+        "llm_latency": args.llm_latency,
+        "translate_latency": args.translate_latency,
+    }
+    metrics = {}
+    for suite in (suite for suite in SUITES if suite in args.suites):
+        # Retrieval and /ask need an index; build one even if ingestion isn't being reported
+        if suite in ("retrieval", "ask") and not ctx.get("ingested"):
+            bench_ingestion(ctx)
+        print(f"Running {suite} benchmarks...", file=sys.stderr)
+        if suite == "ingestion":
+            metrics.update(bench_ingestion(ctx))
+        elif suite == "retrieval":
+            metrics.update(bench_retrieval(ctx))
+        elif suite == "ask":
+            metrics.update(asyncio.run(bench_ask(ctx)))
+        elif suite == "sarvam":
+            metrics.update(asyncio.run(bench_sarvam(ctx)))
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "update_baseline")},
+        "metrics": metrics,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(metrics)} metrics to {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Updated baseline {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to store one")
+        return
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["metrics"]
+    rows = compare(metrics, baseline, args.tolerance)
+    print(f"{'metric':<34} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, reference, value, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<34} {reference:>10.2f} {value:>10.2f} {change:>+8.1%}{flag}")
+    regressions = [row[0] for row in rows if row[4]]
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
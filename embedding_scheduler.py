@@ -0,0 +1,172 @@
+import os
+import json
+import random
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from langchain.schema import Document
+
+logger = logging.getLogger(__name__)
+
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "8000"))
+EMBED_BATCH_MAX_ITEMS = int(os.getenv("EMBED_BATCH_MAX_ITEMS", "256"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_REQUESTS_PER_MINUTE = int(os.getenv("EMBED_REQUESTS_PER_MINUTE", "3000"))
+EMBED_TOKENS_PER_MINUTE = int(os.getenv("EMBED_TOKENS_PER_MINUTE", "1000000"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+
+CHECKPOINT_FILE = "embedding_checkpoint.jsonl"
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")  # text-embedding-3-* tokenizer
+    except Exception as e:
+        logger.warning(f"tiktoken unavailable, estimating tokens from characters: {e}")
+        return None
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+def make_batches(items: list[tuple[str, Document]], max_tokens: int = EMBED_BATCH_TOKENS,
+                 max_items: int = EMBED_BATCH_MAX_ITEMS) -> list[tuple[list, int]]:
+    """Group (id, chunk) pairs into batches of at most max_tokens tokens / max_items chunks."""
+    batches, current, current_tokens = [], [], 0
+    for item in items:
+        tokens = count_tokens(item[1].page_content)
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_items):
+            batches.append((current, current_tokens))
+            current, current_tokens = [], 0
+        current.append(item)
+        current_tokens += tokens
+    if current:
+        batches.append((current, current_tokens))
+    return batches
+
+class RateLimiter:
+    """Token buckets for requests per minute and tokens per minute, shared by worker threads."""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self.request_allowance = float(requests_per_minute)
+        self.token_allowance = float(tokens_per_minute)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int):
+        # A single batch larger than the whole per-minute budget may still go once the bucket is full
+        tokens = min(tokens, self.tpm)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                elapsed = now - self.updated
+                self.updated = now
+                self.request_allowance = min(self.rpm, self.request_allowance + elapsed * self.rpm / 60)
+                self.token_allowance = min(self.tpm, self.token_allowance + elapsed * self.tpm / 60)
+                if self.request_allowance >= 1 and self.token_allowance >= tokens:
+                    self.request_allowance -= 1
+                    self.token_allowance -= tokens
+                    return
+                wait = max((1 - self.request_allowance) * 60 / self.rpm,
+                           (tokens - self.token_allowance) * 60 / self.tpm)
+            time.sleep(max(wait, 0.01))
+
+class EmbeddingScheduler:
+    """Embeds chunks in token-sized batches, several at a time, within the API rate limits.
+
+    Batches are embedded on a thread pool and written to the Chroma collection
+    as they complete. Each written batch is appended to a checkpoint file, so a
+    run that crashes resumes with the chunks that were not stored yet.
+    """
+
+    def __init__(self, embeddings, vectorstore, checkpoint_path: str,
+                 concurrency: int = EMBED_CONCURRENCY, batch_tokens: int = EMBED_BATCH_TOKENS,
+                 requests_per_minute: int = EMBED_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: int = EMBED_TOKENS_PER_MINUTE, max_retries: int = EMBED_MAX_RETRIES):
+        self.embeddings = embeddings
+        self.vectorstore = vectorstore
+        self.checkpoint_path = checkpoint_path
+        self.concurrency = concurrency
+        self.batch_tokens = batch_tokens
+        self.max_retries = max_retries
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+
+    def completed_ids(self) -> set[str]:
+        done = set()
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        done.update(json.loads(line))
+                    except json.JSONDecodeError:
+                        break  # torn last line from a crash
+        return done
+
+    def clear_checkpoint(self):
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def _embed(self, batch: list, tokens: int) -> list[list[float]]:
+        texts = [chunk.page_content for _, chunk in batch]
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(tokens)
+            try:
+                return self.embeddings.embed_documents(texts)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = min(60, 2 ** attempt) + random.uniform(0, 1)
+                logger.warning(f"Embedding batch of {len(batch)} chunks failed ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _store(self, batch: list, vectors: list[list[float]]):
+        self.vectorstore._collection.upsert(
+            ids=[cid for cid, _ in batch],
+            embeddings=vectors,
+            documents=[chunk.page_content for _, chunk in batch],
+            metadatas=[chunk.metadata or None for _, chunk in batch],
+        )
+        with open(self.checkpoint_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps([cid for cid, _ in batch]) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def run(self, ids: list[str], documents: list[Document]) -> dict:
+        done = self.completed_ids()
+        pending = [(cid, doc) for cid, doc in zip(ids, documents) if cid not in done]
+        resumed = len(ids) - len(pending)
+        if resumed:
+            logger.info(f"Resuming from checkpoint: {resumed} chunks already stored")
+        batches = make_batches(pending, self.batch_tokens)
+        started = time.perf_counter()
+        stored = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = {pool.submit(self._embed, batch, tokens): batch for batch, tokens in batches}
+            try:
+                for future in as_completed(futures):
+                    batch = futures[future]
+                    # Writes stay on this thread so Chroma sees one writer
+                    self._store(batch, future.result())
+                    stored += len(batch)
+                    elapsed = time.perf_counter() - started
+                    logger.info(f"Embedded {stored}/{len(pending)} chunks ({stored / elapsed:.1f} chunks/sec)")
+            except BaseException:
+                # Stored batches stay checkpointed; don't start the ones still queued
+                for future in futures:
+                    future.cancel()
+                raise
+        elapsed = time.perf_counter() - started
+        return {
+            "chunks": stored,
+            "resumed": resumed,
+            "batches": len(batches),
+            "seconds": elapsed,
+            "chunks_per_sec": stored / elapsed if elapsed else 0.0,
+        }
@@ -0,0 +1,98 @@
+"""Local stand-in for the Sarvam AI endpoints used by backend_interface.py.
+
+Responses have the same shape as the real API, after a configurable delay,
+and a share of requests can be made to fail to exercise the client's retries.
+
+    uvicorn mock_sarvam_server:app --port 9100
+    SARVAM_BASE_URL=http://127.0.0.1:9100 uvicorn backend_interface:app --port 9000
+"""
+import os
+import io
+import wave
+import uuid
+import base64
+import random
+import asyncio
+from collections import Counter
+from urllib.parse import parse_qs
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+MOCK_SARVAM_LATENCY_SECONDS = float(os.getenv("MOCK_SARVAM_LATENCY_SECONDS", "0.2"))
+MOCK_SARVAM_FAILURE_RATE = float(os.getenv("MOCK_SARVAM_FAILURE_RATE", "0"))
+# Seconds of synthesized silence per character of TTS input
+MOCK_TTS_SECONDS_PER_CHAR = float(os.getenv("MOCK_TTS_SECONDS_PER_CHAR", "0.01"))
+SAMPLE_RATE = 22050
+
+app = FastAPI()
+requests_served = Counter()
+
+async def simulate(endpoint: str):
+    """Count the call, wait like the real API would, and maybe fail; returns an error response or None."""
+    requests_served[endpoint] += 1
+    await asyncio.sleep(MOCK_SARVAM_LATENCY_SECONDS)
+    if random.random() < MOCK_SARVAM_FAILURE_RATE:
+        requests_served[f"{endpoint}:failed"] += 1
+        return JSONResponse(status_code=503, content={"error": {"message": "Simulated outage"}})
+    return None
+
+def silent_wav(seconds: float) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(SAMPLE_RATE)
+        wav_file.writeframes(b"\0\0" * int(seconds * SAMPLE_RATE))
+    return buffer.getvalue()
+
+@app.post("/text-to-speech")
+async def text_to_speech(request: Request):
+    body = await request.json()
+    error = await simulate("text-to-speech")
+    if error:
+        return error
+    audios = [base64.b64encode(silent_wav(len(text) * MOCK_TTS_SECONDS_PER_CHAR)).decode("ascii") for text in body["inputs"]]
+    return {"request_id": uuid.uuid4().hex, "audios": audios}
+
+@app.post("/transliterate")
+async def transliterate(request: Request):
+    body = await request.json()
+    error = await simulate("transliterate")
+    if error:
+        return error
+    return {
+        "request_id": uuid.uuid4().hex,
+        "transliterated_text": body["input"],
+        "source_language_code": body["source_language_code"],
+    }
+
+@app.post("/text-analytics")
+async def text_analytics(request: Request):
+    form = parse_qs((await request.body()).decode("utf-8"))
+    error = await simulate("text-analytics")
+    if error:
+        return error
+    questions = form.get("questions", [""])[0]
+    return {"answers": [{"question": questions, "response": f"Mock answer from {len(form.get('text', [''])[0])} characters of context"}]}
+
+@app.post("/speech-to-text")
+async def speech_to_text(request: Request):
+    form = await request.form()
+    data = await form["file"].read()
+    error = await simulate("speech-to-text")
+    if error:
+        return error
+    try:
+        with wave.open(io.BytesIO(data), "rb") as wav_file:
+            seconds = wav_file.getnframes() / wav_file.getframerate()
+    except (wave.Error, EOFError):
+        seconds = 0.0
+    return {
+        "request_id": uuid.uuid4().hex,
+        "transcript": f"[{seconds:.1f}s of speech]",
+        "language_code": form.get("language_code"),
+    }
+
+@app.get("/stats")
+async def stats():
+    return dict(requests_served)
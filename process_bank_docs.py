@@ -1,14 +1,22 @@
 import os
+import argparse
+import hashlib
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from dotenv import load_dotenv
-from langchain_community.document_loaders import DirectoryLoader, UnstructuredFileLoader
+from langchain_community.document_loaders import UnstructuredFileLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import Chroma
 from langchain.schema import Document
 import logging
 import sys
-from typing import Optional
+from typing import Optional, Iterable, Iterator
 from unstructured.partition.md import partition_md
+from backend.embedding_cache import CachedEmbeddings, cached_openai_embeddings
+from backend.bank_metadata import path_metadata
+from backend.bm25_index import BM25_INDEX_FILE, BM25Index
+from embedding_scheduler import CHECKPOINT_FILE, EmbeddingScheduler
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -17,6 +25,14 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+# Records which chunks of which file version are already embedded.
+# Bump the version when chunk metadata changes so existing indexes are rebuilt.
+MANIFEST_FILE = "ingest_manifest.json"
+MANIFEST_VERSION = 2
+
+# partition_md is CPU-bound, so files are parsed on a process pool
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 1)))
+
 class CustomUnstructuredFileLoader(UnstructuredFileLoader):
     """Custom loader with better error handling."""
     def _get_elements(self) -> list:
@@ -28,17 +44,37 @@ class CustomUnstructuredFileLoader(UnstructuredFileLoader):
             logger.warning(f"Error processing file {self.file_path}: {str(e)}")
             return []
 
-def load_documents_from_directory(directory_path: str) -> list[Document]:
+def parse_file(path: str) -> list[Document]:
+    """Parse one file and tag it with its bank and loan type; runs inside a worker process."""
+    try:
+        documents = CustomUnstructuredFileLoader(path).load()
+        for doc in documents:
+            doc.metadata.update(path_metadata(path))
+        return documents
+    except Exception as e:
+        logger.warning(f"Error loading {path}: {str(e)}")
+        return []
+
+def parse_files(paths: Iterable[str], workers: int = PARSE_WORKERS) -> Iterator[Document]:
+    """Parse files on a process pool, yielding documents in completion order."""
+    paths = list(paths)
+    if not paths:
+        return
+    started = time.perf_counter()
+    if workers <= 1:
+        for path in paths:
+            yield from parse_file(path)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+            for future in as_completed([pool.submit(parse_file, path) for path in paths]):
+                yield from future.result()
+    elapsed = time.perf_counter() - started
+    logger.info(f"Parsed {len(paths)} files in {elapsed:.2f}s ({len(paths) / elapsed:.1f} files/sec, {workers} workers)")
+
+def load_documents_from_directory(directory_path: str, workers: int = PARSE_WORKERS) -> list[Document]:
     """Load documents from a directory."""
     try:
-        loader = DirectoryLoader(
-            directory_path,
-            glob="**/*",  # Load all files recursively
-            show_progress=True,
-            loader_cls=CustomUnstructuredFileLoader,
-            use_multithreading=True
-        )
-        documents = loader.load()
+        documents = list(parse_files(list_source_files(directory_path), workers))
         logger.info(f"Loaded {len(documents)} documents from {directory_path}")
         return documents
     except Exception as e:
@@ -61,32 +97,158 @@ def split_documents(documents: list[Document], chunk_size: int = 1000, chunk_ove
     logger.info(f"Split documents into {len(splits)} chunks")
     return splits
 
-def create_embeddings_and_store(documents: list[Document], persist_directory: str) -> Optional[Chroma]:
-    """Create embeddings using OpenAI's text-embedding-3-small and store in Chroma."""
+def get_embeddings() -> CachedEmbeddings:
+    # Shared with the query side, so unchanged text is never sent to the API twice
+    return cached_openai_embeddings(
+        model="text-embedding-3-small",
+        dimensions=1536,  # Dimensionality of text-embedding-3-small
+    )
+
+def get_scheduler(vectorstore: Chroma, persist_directory: str) -> EmbeddingScheduler:
+    return EmbeddingScheduler(
+        embeddings=vectorstore.embeddings,
+        vectorstore=vectorstore,
+        checkpoint_path=os.path.join(persist_directory, CHECKPOINT_FILE),
+    )
+
+def create_embeddings_and_store(documents: list[Document], persist_directory: str, ids: Optional[list[str]] = None) -> Optional[Chroma]:
+    """Create embeddings using OpenAI's text-embedding-3-small and store in Chroma.
+
+    Embedding is batched, concurrent and rate limited by EmbeddingScheduler,
+    which checkpoints every stored batch so an interrupted run can resume.
+    """
     if not documents:
         logger.error("No documents to create embeddings for")
         return None
         
     try:
-        embeddings = OpenAIEmbeddings(
-            model="text-embedding-3-small",
-            dimensions=1536,  # Dimensionality of text-embedding-3-small
-        )
-        
-        # Create and persist the vector store
-        vectorstore = Chroma.from_documents(
-            documents=documents,
-            embedding=embeddings,
-            persist_directory=persist_directory
+        os.makedirs(persist_directory, exist_ok=True)
+        vectorstore = Chroma(persist_directory=persist_directory, embedding_function=get_embeddings())
+        stats = get_scheduler(vectorstore, persist_directory).run(ids or [chunk_id(doc) for doc in documents], documents)
+        logger.info(
+            f"Created and stored {stats['chunks']} embeddings in {persist_directory} "
+            f"({stats['batches']} batches, {stats['chunks_per_sec']:.1f} chunks/sec, "
+            f"{stats['resumed']} resumed from checkpoint)"
         )
-        vectorstore.persist()
-        logger.info(f"Created and stored embeddings in {persist_directory}")
         return vectorstore
     except Exception as e:
         logger.error(f"Error creating embeddings: {str(e)}")
         return None
 
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def chunk_id(chunk: Document) -> str:
+    """Content-addressed id: the same text from the same file always maps to the same vector."""
+    key = f"{chunk.metadata.get('source', '')}\0{chunk.page_content}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+def list_source_files(base_dir: str) -> list[str]:
+    """All non-hidden files under base_dir, as the paths the loaders record in ``source``."""
+    files = []
+    for root, dirs, names in os.walk(base_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        files.extend(os.path.join(root, name) for name in sorted(names) if not name.startswith('.'))
+    return files
+
+def load_manifest(persist_directory: str) -> dict:
+    path = os.path.join(persist_directory, MANIFEST_FILE)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+        logger.warning("Ingestion manifest has an old format; rebuilding the index")
+    return {"version": MANIFEST_VERSION, "files": {}}
+
+def save_manifest(persist_directory: str, manifest: dict):
+    os.makedirs(persist_directory, exist_ok=True)
+    path = os.path.join(persist_directory, MANIFEST_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def sync_vectorstore(base_dir: str, persist_directory: str, full: bool = False, workers: int = PARSE_WORKERS) -> dict:
+    """Bring the Chroma index in line with base_dir, embedding only new or changed chunks.
+
+    Unchanged files (same sha256 as in the manifest) are neither parsed nor
+    embedded. Changed files are re-split and only chunks whose content hash is
+    not already indexed are embedded; vectors of chunks that disappeared, and of
+    files that were removed, are deleted.
+    """
+    manifest = {"version": MANIFEST_VERSION, "files": {}} if full else load_manifest(persist_directory)
+    scheduler = get_scheduler(Chroma(persist_directory=persist_directory, embedding_function=get_embeddings()), persist_directory)
+    # Without a manifest the index is rebuilt, unless a crashed rebuild left a checkpoint to resume from
+    if full or (not manifest["files"] and not scheduler.completed_ids()):
+        manifest = {"version": MANIFEST_VERSION, "files": {}}
+        # Empty the manifest on disk first: if the rebuild crashes, the next run must not
+        # trust the old one, but resume from the checkpoint instead
+        save_manifest(persist_directory, manifest)
+        scheduler.vectorstore.delete_collection()
+        scheduler.clear_checkpoint()
+    old_files = manifest["files"]
+
+    current = {path: file_sha256(path) for path in list_source_files(base_dir)}
+    changed = [path for path, digest in current.items() if old_files.get(path, {}).get("sha256") != digest]
+    removed = [path for path in old_files if path not in current]
+    stats = {"files": len(current), "changed_files": len(changed), "removed_files": len(removed),
+             "embedded": 0, "skipped": 0, "deleted": 0}
+    stats["skipped"] = sum(len(old_files[path]["chunks"]) for path in current if path not in changed)
+
+    # Parse and split only what changed
+    splits = split_documents(list(parse_files(changed, workers))) if changed else []
+    new_chunks = {path: {} for path in changed}
+    for chunk in splits:
+        new_chunks.setdefault(chunk.metadata.get("source"), {}).setdefault(chunk_id(chunk), chunk)
+
+    to_add, to_delete = {}, []
+    for path in changed:
+        old_ids = set(old_files.get(path, {}).get("chunks", []))
+        chunks = new_chunks.get(path, {})
+        to_add.update({cid: chunk for cid, chunk in chunks.items() if cid not in old_ids})
+        to_delete.extend(old_ids - chunks.keys())
+        stats["skipped"] += len(old_ids & chunks.keys())
+    for path in removed:
+        to_delete.extend(old_files[path]["chunks"])
+    # Chunks stored by a crashed run that no longer belong to any file
+    indexed = set(to_add)
+    for path in current:
+        indexed.update(new_chunks[path].keys() if path in new_chunks else old_files[path]["chunks"])
+    to_delete.extend(scheduler.completed_ids() - indexed - set(to_delete))
+
+    if to_delete:
+        Chroma(persist_directory=persist_directory, embedding_function=get_embeddings()).delete(ids=to_delete)
+        stats["deleted"] = len(to_delete)
+    if to_add:
+        if not create_embeddings_and_store(list(to_add.values()), persist_directory, ids=list(to_add.keys())):
+            raise RuntimeError("Failed to create and store embeddings.")
+        stats["embedded"] = len(to_add)
+
+    # Only record progress once the vector store reflects it
+    files = {path: entry for path, entry in old_files.items() if path in current and path not in changed}
+    for path in changed:
+        files[path] = {"sha256": current[path], "chunks": sorted(new_chunks.get(path, {}).keys())}
+    manifest["files"] = files
+    save_manifest(persist_directory, manifest)
+    scheduler.clear_checkpoint()
+
+    # The lexical index always mirrors the full collection; rebuilding it needs no embeddings
+    bm25 = BM25Index.from_vectorstore(Chroma(persist_directory=persist_directory, embedding_function=get_embeddings()))
+    bm25.save(os.path.join(persist_directory, BM25_INDEX_FILE))
+    logger.info(f"Built BM25 index over {len(bm25)} chunks")
+    return stats
+
 def main():
+    parser = argparse.ArgumentParser(description="Embed the bank documents into the Chroma index.")
+    parser.add_argument("--full", action="store_true", help="drop the index and re-embed every document")
+    parser.add_argument("--workers", type=int, default=PARSE_WORKERS, help="processes used to parse documents")
+    args = parser.parse_args()
+
     try:
         # Check for OpenAI API key
         if not os.getenv("OPENAI_API_KEY"):
@@ -99,34 +261,16 @@ def main():
         if not os.path.exists(base_dir):
             raise ValueError(f"Directory '{base_dir}' does not exist")
         
-        # Load all documents
-        all_documents = []
-        for bank_dir in os.listdir(base_dir):
-            if bank_dir.startswith('.'):  # Skip hidden files
-                continue
-            full_path = os.path.join(base_dir, bank_dir)
-            if os.path.isdir(full_path):
-                documents = load_documents_from_directory(full_path)
-                all_documents.extend(documents)
-        
-        if not all_documents:
-            logger.error("No documents were loaded. Please check the directory structure and file formats.")
+        stats = sync_vectorstore(base_dir, persist_dir, full=args.full, workers=args.workers)
+        if not stats["files"]:
+            logger.error("No documents were found. Please check the directory structure and file formats.")
             sys.exit(1)
-        
-        # Split documents into chunks
-        splits = split_documents(all_documents)
-        
-        if not splits:
-            logger.error("Failed to split documents into chunks.")
-            sys.exit(1)
-        
-        # Create embeddings and store in the vector database
-        vectorstore = create_embeddings_and_store(splits, persist_dir)
-        
-        if not vectorstore:
-            logger.error("Failed to create and store embeddings.")
-            sys.exit(1)
-            
+
+        logger.info(
+            f"{stats['changed_files']} of {stats['files']} files changed, {stats['removed_files']} removed; "
+            f"embedded {stats['embedded']} chunks, skipped {stats['skipped']} unchanged chunks, "
+            f"deleted {stats['deleted']} stale chunks"
+        )
         logger.info("Successfully processed all documents and created embeddings!")
         
     except Exception as e:
@@ -134,4 +278,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,92 @@
+import os
+import random
+import asyncio
+import logging
+from typing import Optional
+import httpx
+from dotenv import load_dotenv
+from backend.telemetry import span
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+SARVAM_API_KEY = os.getenv("SARVAM_API_KEY")
+# Point at mock_sarvam_server.py (e.g. http://127.0.0.1:9100) to run without the real API
+SARVAM_BASE_URL = os.getenv("SARVAM_BASE_URL", "https://api.sarvam.ai")
+SARVAM_TIMEOUT_SECONDS = float(os.getenv("SARVAM_TIMEOUT_SECONDS", "60"))
+SARVAM_MAX_CONNECTIONS = int(os.getenv("SARVAM_MAX_CONNECTIONS", "20"))
+SARVAM_MAX_RETRIES = int(os.getenv("SARVAM_MAX_RETRIES", "3"))
+
+# Worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+def http2_available() -> bool:
+    try:
+        import h2  # noqa: F401  (installed by httpx[http2])
+        return True
+    except ImportError:
+        return False
+
+class SarvamClient:
+    """One pooled, keep-alive ``httpx.AsyncClient`` for every Sarvam API call.
+
+    ``backend_interface.py`` opens it in its lifespan and closes it on
+    shutdown; scripts that skip the lifespan get a client on first use.
+    Requests that fail with a connection error or a retryable status are
+    retried with exponential backoff and jitter.
+    """
+
+    def __init__(self, base_url: str = SARVAM_BASE_URL, api_key: Optional[str] = SARVAM_API_KEY,
+                 timeout: float = SARVAM_TIMEOUT_SECONDS, max_connections: int = SARVAM_MAX_CONNECTIONS,
+                 max_retries: int = SARVAM_MAX_RETRIES):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"api-subscription-key": self.api_key or ""},
+                http2=http2_available(),
+                timeout=httpx.Timeout(self.timeout, connect=10.0),
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def post(self, path: str, **kwargs) -> httpx.Response:
+        # One span per call (retries included), e.g. "sarvam:/text-to-speech"
+        with span(f"sarvam:{path}") as record:
+            return await self._post(path, record, **kwargs)
+
+    async def _post(self, path: str, record: dict, **kwargs) -> httpx.Response:
+        client = await self.start()
+        for attempt in range(self.max_retries + 1):
+            record["attempts"] = attempt + 1
+            try:
+                response = await client.post(path, **kwargs)
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    record["status"] = response.status_code
+                    return response
+                retry_after = response.headers.get("Retry-After")
+                reason = f"status {response.status_code}"
+            except (httpx.TransportError, httpx.TimeoutException) as e:
+                if attempt == self.max_retries:
+                    raise
+                retry_after = None
+                reason = repr(e)
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else min(30, 0.5 * 2 ** attempt)
+            delay += random.uniform(0, 0.25)
+            logger.warning(f"Sarvam {path} failed ({reason}); retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+sarvam_client = SarvamClient()
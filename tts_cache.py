@@ -0,0 +1,114 @@
+import os
+import json
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(500 * 1024 * 1024)))
+
+class AudioCache:
+    """Synthesized WAV files named by a hash of everything that affects the audio.
+
+    The same text and voice settings always map to the same file, so repeats
+    are served from disk instead of the TTS API. The directory is kept under
+    ``max_bytes`` by deleting the least recently used files; recency survives
+    restarts through file modification times.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = TTS_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        # file name -> size, least recently used first
+        self._files = OrderedDict()
+        entries = []
+        for entry in os.scandir(directory):
+            if entry.is_file() and entry.name.endswith(".wav"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._files[name] = size
+        self.total_bytes = sum(self._files.values())
+        self._evict()
+
+    @staticmethod
+    def key(text, language, speaker, model, pitch, pace, loudness) -> str:
+        """File name for a synthesis request."""
+        params = [text, language, speaker, model, float(pitch), float(pace), float(loudness)]
+        return hashlib.sha256(json.dumps(params, ensure_ascii=False).encode("utf-8")).hexdigest() + ".wav"
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _touch(self, name: str):
+        self._files.move_to_end(name)
+        try:
+            os.utime(self.path(name))
+        except OSError:
+            pass
+
+    def lookup(self, name: str) -> Optional[str]:
+        """Path of a cached file, counted as a hit or a miss."""
+        with self._lock:
+            if name in self._files and os.path.exists(self.path(name)):
+                self.hits += 1
+                self._touch(name)
+                return self.path(name)
+            # A file deleted behind our back no longer counts towards the size limit
+            self.total_bytes -= self._files.pop(name, 0)
+            self.misses += 1
+            return None
+
+    def open_path(self, name: str) -> Optional[str]:
+        """Path of a cached file for serving; refreshes its recency but isn't a hit."""
+        with self._lock:
+            if name in self._files and os.path.exists(self.path(name)):
+                self._touch(name)
+                return self.path(name)
+            return None
+
+    def store(self, name: str, data: bytes) -> str:
+        tmp_path = f"{self.path(name)}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path(name))
+        with self._lock:
+            self.total_bytes += len(data) - self._files.get(name, 0)
+            self._files[name] = len(data)
+            self._files.move_to_end(name)
+            # Never evict the file just written, even if it alone exceeds the cap
+            self._evict(keep=name)
+        return self.path(name)
+
+    def _evict(self, keep: Optional[str] = None):
+        while self.total_bytes > self.max_bytes and self._files:
+            name, size = next(iter(self._files.items()))
+            if name == keep:
+                break
+            del self._files[name]
+            self.total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self.path(name))
+            except OSError as e:
+                logger.warning(f"Failed to evict {name} from the audio cache: {e}")
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._files),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+        }